@@ -2,6 +2,7 @@
 #/usr/local/bin/python3
 # Set the path to your python3 above
 
+import sys
 from gtp_connection import GtpConnection
 from board_util import GoBoardUtil
 from simple_board import SimpleGoBoard
@@ -23,9 +24,11 @@ class Gomoku():
 def run():
     """
     start the gtp connection and wait for commands.
+    With --batch, responses are buffered for regression scripts.
     """
     board = SimpleGoBoard(7)
-    con = GtpConnection(Gomoku(), board)
+    con = GtpConnection(Gomoku(), board,
+                        batch_mode = "--batch" in sys.argv[1:])
     con.start_connection()
 
 if __name__=='__main__':
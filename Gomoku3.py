@@ -4,45 +4,52 @@
 
 #Simulation-based player for Gomoku
 
-from gtp_connection import GtpConnection
-from board_util import GoBoardUtil
+from gtp_connection import GtpConnection, random_simulation
+from board_util import GoBoardUtil, PASS
 from simple_board import SimpleGoBoard
 
 class Gomoku3():
-    numSims = 10
+    def __init__(self, num_simulations = 10):
+        """
+        Gomoku player that plays the legal move with the most wins
+        in num_simulations random playouts after it.
+        """
+        self.num_simulations = num_simulations
+        self.name = "Simulation Player ({0} sim.)".format(num_simulations)
+        self.version = 1.0
 
-    def name(self):
-        return "Simulation Player ({0} sim.)".format(self.numSimulations)
-
-    def genmove(self):
-        assert not self.check_game_end_gomoku()
-        moves = GoBoardUtil.generate_legal_moves_gomoku(self.board)
-        numMoves = len(moves)
-        score = [0] * numMoves
-        for i in range(numMoves):
-            move = moves[i]
-            score[i] = self.simulate(self.board, move)
-        #print(score)
-        bestIndex = score.index(max(score))
-        best = moves[bestIndex]
-        #print("Best move:", best, "score", score[best])
-        assert best in GoBoardUtil.generate_legal_moves_gomoku(self.board)
+    def get_move(self, board, color):
+        assert board.winner is None
+        moves = GoBoardUtil.generate_legal_moves_gomoku(board)
+        if not moves:
+            return PASS
+        score = [self.simulate(board, move, color) for move in moves]
+        best = moves[score.index(max(score))]
+        assert best in GoBoardUtil.generate_legal_moves_gomoku(board)
         return best
 
-    def simulate(self, state, move):
-        stats = [0] * 3
-        state.play(move)
-        moveNr = state.moveNumber()
-        for _ in range(self.numSimulations):
-            winner, _ = state.simulate()
-            stats[winner] += 1
-            state.resetToMoveNumber(moveNr)
-        assert sum(stats) == self.numSimulations
-        assert moveNr == state.moveNumber()
-        state.undoMove()
-        eval = (stats[BLACK] + 0.5 * stats[EMPTY]) / self.numSimulations
-        if state.toPlay == WHITE:
-            eval = 1 - eval
-        return eval
+    def simulate(self, board, move, color):
+        """
+        Win rate of color in random playouts after color plays move.
+        board is unchanged on return.
+        """
+        board.play_move_gomoku(move, color)
+        move_nr = board.move_number()
+        opp_color = GoBoardUtil.opponent(color)
+        wins = 0
+        for _ in range(self.num_simulations):
+            wins += random_simulation(board, color, opp_color)
+        assert move_nr == board.move_number()
+        board.undo_move()
+        return wins / self.num_simulations
+
+def run():
+    """
+    start the gtp connection and wait for commands.
+    """
+    board = SimpleGoBoard(7)
+    con = GtpConnection(Gomoku3(), board)
+    con.start_connection()
 
-Gomoku3()
+if __name__=='__main__':
+    run()
@@ -0,0 +1,298 @@
+"""
+alphabeta.py
+
+Iterative-deepening alpha-beta (negamax) search for Gomoku.
+
+A deterministic alternative to the simulation policies. Every
+iteration searches one ply deeper than the last, until the maximum
+depth, the deadline or a stop request. Then the move of the last
+completed iteration is played.
+
+Leaves are scored by a static evaluator built on the pattern counters
+of SimpleGoBoard: the length-5 window counts (window_hist) and the
+block-win and open-four counts of board_patterns.
+
+Only the candidate moves of the board, the empty points near a stone,
+are searched.
+When the opponent has a point where it makes five, the player to
+move only tries to block it. Moves are ordered by:
+- the best move of the previous iteration, at the root
+- the best move stored in the transposition table for the position
+- two killer moves per ply: moves which caused a cutoff at that ply
+- the history heuristic: moves which caused cutoffs anywhere,
+  weighted by the square of the remaining depth
+
+With a transposition table, every inner node is looked up before its
+moves are searched. An entry searched at least as deep gives the score
+or a bound on it, which may end the node at once. Each node stores its
+score, bound type, best move and remaining depth when it is done.
+"""
+
+import time
+from board_util import GoBoardUtil, BLACK, WHITE, PASS, coord_to_point
+from transposition import position_key
+
+# Score of a won position, less the number of plies to the win
+WIN = 1000000
+# Default depth limit of the search
+MAX_DEPTH = 4
+# Evaluation weight of a window with k stones of one color and
+# none of the other, by k
+WINDOW_WEIGHTS = [0, 1, 8, 64, 512, 0]
+# Evaluation weights of the board_patterns counts, per stone
+BLOCK_WIN_WEIGHT = 256
+OPEN_FOUR_WEIGHT = 1024
+# Number of killer moves kept per ply
+NUM_KILLERS = 2
+# The clock is read once every this many nodes
+CLOCK_INTERVAL = 64
+# Bound types of the transposition table entries, kept in their
+# visits field: exact score, lower bound (a cutoff), upper bound
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+# Scores at least this close to WIN are wins at a number of plies
+WIN_SCORES = WIN - 1000
+
+class SearchTimeout(Exception):
+    """
+    Raised when the deadline passes or a stop is requested
+    during an iteration
+    """
+
+def candidate_moves(board):
+    """
+    Sorted candidate moves of board, or the center point on an
+    empty board
+    """
+    if not board.moves:
+        center = (board.size + 1) // 2
+        return [coord_to_point(center, center, board.size)]
+    return sorted(board.candidate_point_list())
+
+def evaluate(board, color):
+    """
+    Static score of board for color, positive if color is better
+    """
+    opp_color = GoBoardUtil.opponent(color)
+    mine = board.window_hist[color]
+    theirs = board.window_hist[opp_color]
+    score = 0
+    for k in range(1, 5):
+        score += WINDOW_WEIGHTS[k] * (mine[k] - theirs[k])
+    my_block_win, my_open_four, _ = board.count_patterns(color)
+    their_block_win, their_open_four, _ = board.count_patterns(opp_color)
+    score += BLOCK_WIN_WEIGHT * (my_block_win - their_block_win)
+    score += OPEN_FOUR_WEIGHT * (my_open_four - their_open_four)
+    return score
+
+def score_to_table(score, ply):
+    """
+    Win scores count plies from the root; stored ones count from
+    the node, so that they hold wherever the position is reached
+    """
+    if score >= WIN_SCORES:
+        return score + ply
+    if score <= -WIN_SCORES:
+        return score - ply
+    return score
+
+def score_from_table(score, ply):
+    if score >= WIN_SCORES:
+        return score - ply
+    if score <= -WIN_SCORES:
+        return score + ply
+    return score
+
+class AlphaBeta(object):
+    """
+    Iterative-deepening negamax search with alpha-beta pruning,
+    killer moves and the history heuristic.
+    After a search, depth is the last completed depth, nodes the
+    number of nodes searched, tt_cutoffs the nodes ended by a table
+    entry and nps the nodes per second.
+
+    tt is an optional transposition.TranspositionTable, and salt
+    keeps the entries of this search apart from other searches in it.
+    """
+    def __init__(self, max_depth = MAX_DEPTH, tt = None, salt = 0):
+        self.max_depth = max_depth
+        self.tt = tt
+        self.salt = salt
+        self.depth = 0
+        self.nodes = 0
+        self.tt_cutoffs = 0
+        self.nps = 0.0
+        self.score = 0
+
+    def search(self, board, color, deadline = None, stop = None):
+        """
+        Search from the board position with color to play, up to
+        max_depth plies, until the deadline or until the
+        threading.Event stop is set. board is unchanged on return.
+        Returns the best move, or PASS if there is none.
+        """
+        start = time.time()
+        self.deadline = deadline
+        self.stop = stop
+        self.nodes = 0
+        self.tt_cutoffs = 0
+        self.depth = 0
+        self.score = 0
+        self.killers = [[] for _ in range(self.max_depth + 1)]
+        self.history = {BLACK: {}, WHITE: {}}
+        move_nr = board.move_number()
+        moves = self._forced_moves(board, color)
+        if moves is None:
+            moves = candidate_moves(board)
+        if not moves:
+            return PASS
+        self._table_move_first(board, color, moves)
+        best_move = moves[0]
+        max_depth = min(self.max_depth, len(board.empty_set))
+        try:
+            for depth in range(1, max_depth + 1):
+                best_move, self.score = self._root(board, color, moves,
+                                                   depth)
+                self.depth = depth
+                if self.tt is not None:
+                    self.tt.store(position_key(board, color, self.salt),
+                                  score_to_table(self.score, 0), EXACT,
+                                  best_move, depth)
+                # search the best move first in the next iteration
+                moves.remove(best_move)
+                moves.insert(0, best_move)
+                if abs(self.score) >= WIN - self.max_depth:
+                    break
+        except SearchTimeout:
+            board.reset_to_move_number(move_nr)
+        elapsed = time.time() - start
+        self.nps = self.nodes / elapsed if elapsed > 0 else 0.0
+        return best_move
+
+    def _root(self, board, color, moves, depth):
+        opp_color = GoBoardUtil.opponent(color)
+        alpha = -WIN - 1
+        best_move = moves[0]
+        for move in moves:
+            board.play_move_gomoku(move, color)
+            score = -self._negamax(board, opp_color, depth - 1, 1,
+                                   -WIN - 1, -alpha)
+            board.undo_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        return best_move, alpha
+
+    def _forced_moves(self, board, color):
+        """
+        The moves color must play to not lose at once: a winning
+        point of color, or else the winning points of the opponent.
+        None if there are none.
+        """
+        fives = board.winning_points(color)
+        if fives:
+            return fives[:1]
+        blocks = board.winning_points(GoBoardUtil.opponent(color))
+        if blocks:
+            return blocks
+        return None
+
+    def _table_move_first(self, board, color, moves):
+        """
+        Move the best move stored for the position to the front of
+        moves. Returns the table entry, or None.
+        """
+        if self.tt is None:
+            return None
+        entry = self.tt.probe(position_key(board, color, self.salt))
+        if entry is not None and entry[2] in moves:
+            moves.remove(entry[2])
+            moves.insert(0, entry[2])
+        return entry
+
+    def _negamax(self, board, color, depth, ply, alpha, beta):
+        self.nodes += 1
+        if self.nodes % CLOCK_INTERVAL == 0:
+            if self.deadline is not None and time.time() >= self.deadline:
+                raise SearchTimeout()
+            if self.stop is not None and self.stop.is_set():
+                raise SearchTimeout()
+        if board.winner is not None:
+            # the last move made five
+            return -(WIN - ply)
+        if len(board.empty_set) == 0:
+            return 0
+        if board.winning_points(color):
+            return WIN - ply - 1
+        opp_color = GoBoardUtil.opponent(color)
+        blocks = board.winning_points(opp_color)
+        if len(blocks) > 1:
+            return -(WIN - ply - 2)
+        if depth <= 0:
+            return evaluate(board, color)
+        if blocks:
+            moves = blocks
+        else:
+            moves = self._ordered(candidate_moves(board), color, ply)
+        entry = self._table_move_first(board, color, moves)
+        if entry is not None and entry[3] >= depth:
+            value = score_from_table(entry[0], ply)
+            bound = entry[1]
+            if bound == EXACT or \
+               (bound == LOWER_BOUND and value >= beta) or \
+               (bound == UPPER_BOUND and value <= alpha):
+                self.tt_cutoffs += 1
+                return value
+        original_alpha = alpha
+        best_score = -WIN - 1
+        best_move = moves[0]
+        for move in moves:
+            board.play_move_gomoku(move, color)
+            score = -self._negamax(board, opp_color, depth - 1, ply + 1,
+                                   -beta, -alpha)
+            board.undo_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._cutoff(move, color, depth, ply)
+                break
+        if self.tt is not None:
+            if best_score <= original_alpha:
+                bound = UPPER_BOUND
+            elif best_score >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self.tt.store(position_key(board, color, self.salt),
+                          score_to_table(best_score, ply), bound,
+                          best_move, depth)
+        return best_score
+
+    def _ordered(self, moves, color, ply):
+        """
+        moves with the killer moves of ply first, then by history score
+        """
+        history = self.history[color]
+        moves.sort(key = lambda move: history.get(move, 0), reverse = True)
+        if ply < len(self.killers):
+            for killer in reversed(self.killers[ply]):
+                if killer in moves:
+                    moves.remove(killer)
+                    moves.insert(0, killer)
+        return moves
+
+    def _cutoff(self, move, color, depth, ply):
+        """
+        Record move as a killer of ply and add to its history score
+        """
+        history = self.history[color]
+        history[move] = history.get(move, 0) + depth * depth
+        killers = self.killers[ply]
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[NUM_KILLERS:]
@@ -0,0 +1,136 @@
+"""
+batch_playout.py
+
+Random Gomoku playouts run as one batch of NumPy arrays.
+
+A uniformly random playout from a position is the same as playing the
+empty points in a uniformly random order until someone makes five.
+So each game of the batch gets a random permutation of the empty
+points, and ply k of all games is played at once: every game puts a
+stone of the same color on its k-th point. Wins are detected with the
+length-5 window tables of board_util.five_windows: each game keeps the
+number of stones of each color in every window, and a window count
+of five is a win.
+"""
+
+import numpy as np
+from board_util import GoBoardUtil, BLACK, WHITE, five_windows
+
+# Upper limit on the number of games simulated together,
+# to bound the memory used for the random orders
+MAX_BATCH = 2048
+
+_window_tables = {}
+
+def window_tables(size):
+    """
+    Return windows and a padded point-to-windows array for the given size.
+    point_windows[p] lists the windows through point p, padded with the
+    extra dummy window len(windows).
+    """
+    if size not in _window_tables:
+        windows, point_windows = five_windows(size)
+        dummy = len(windows)
+        width = max(1, max(len(ws) for ws in point_windows))
+        padded = np.full((len(point_windows), width), dummy, dtype = np.intp)
+        for point, ws in enumerate(point_windows):
+            padded[point, :len(ws)] = ws
+        _window_tables[size] = (windows, padded)
+    return _window_tables[size]
+
+def simulate_moves(board, color, moves, num_games, rng = None, seeds = None):
+    """
+    Run num_games random playouts after each of the given moves.
+
+    Arguments
+    ---------
+    board: the root position, which must not be a finished game.
+        It is not modified.
+    color: the player who plays each move in moves
+    moves: list of empty points
+    num_games: number of playouts per move
+    rng: numpy random Generator, a new unseeded one by default
+    seeds: optional list with one seed per move. The playouts of each
+        move then only depend on its own seed, not on the other moves.
+
+    Returns
+    -------
+    numpy array of shape (len(moves), 3) with the number of
+    wins, draws and losses of color for each move
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    stats = np.zeros((len(moves), 3), dtype = np.int64)
+    if len(moves) == 0 or num_games <= 0:
+        return stats
+    # more than MAX_BATCH games of a move are run in several batches,
+    # drawing on from the same generators
+    games_per_batch = min(num_games, MAX_BATCH)
+    moves_per_batch = MAX_BATCH // games_per_batch
+    for start in range(0, len(moves), moves_per_batch):
+        batch_moves = moves[start : start + moves_per_batch]
+        if seeds is None:
+            rngs = [rng]
+        else:
+            rngs = [np.random.default_rng(seed)
+                    for seed in seeds[start : start + moves_per_batch]]
+        done = 0
+        while done < num_games:
+            n = min(games_per_batch, num_games - done)
+            outcome = _simulate_batch(board, color, batch_moves, n, rngs)
+            stats[start : start + len(batch_moves)] += outcome
+            done += n
+    return stats
+
+def _simulate_batch(board, color, moves, num_games, rngs):
+    """
+    Simulate all games of the given moves together.
+    rngs is either a single generator for all games or one per move.
+    """
+    windows, point_windows = window_tables(board.size)
+    dummy = len(windows)
+    root = np.asarray(board.board, dtype = np.int8)
+    empty_points = np.array(board.get_empty_points(), dtype = np.intp)
+    num_empty = len(empty_points)
+    num = len(moves) * num_games
+
+    # stone counts per game, color and window, plus the dummy window
+    counts = {}
+    for c in (BLACK, WHITE):
+        root_counts = np.zeros(dummy + 1, dtype = np.int8)
+        root_counts[:dummy] = (root[windows] == c).sum(axis = 1)
+        counts[c] = np.repeat(root_counts[None, :], num, axis = 0)
+
+    # random order of the empty points for every game,
+    # with the game's first move sorted to the front
+    if len(rngs) == 1:
+        keys = rngs[0].random((num, num_empty))
+    else:
+        keys = np.concatenate([rng.random((num_games, num_empty))
+                               for rng in rngs])
+    index_of = {int(p): i for i, p in enumerate(empty_points)}
+    first = np.repeat([index_of[int(m)] for m in moves], num_games)
+    keys[np.arange(num), first] = -1.0
+    order = empty_points[np.argsort(keys, axis = 1)]
+
+    winner = np.zeros(num, dtype = np.int8)
+    active = np.arange(num)
+    to_play = color
+    for ply in range(num_empty):
+        if len(active) == 0:
+            break
+        points = order[active, ply]
+        touched = point_windows[points]
+        my_counts = counts[to_play]
+        my_counts[active[:, None], touched] += 1
+        my_counts[active, dummy] = 0
+        five = (my_counts[active[:, None], touched] == 5).any(axis = 1)
+        winner[active[five]] = to_play
+        active = active[~five]
+        to_play = GoBoardUtil.opponent(to_play)
+
+    winner = winner.reshape(len(moves), num_games)
+    wins = (winner == color).sum(axis = 1)
+    losses = (winner == GoBoardUtil.opponent(color)).sum(axis = 1)
+    draws = num_games - wins - losses
+    return np.stack([wins, draws, losses], axis = 1)
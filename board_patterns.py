@@ -0,0 +1,135 @@
+"""
+board_patterns.py
+
+Vectorized versions of the Gomoku pattern checks in simple_board.py:
+_point_direction_check_block_win, _point_direction_check_open and
+_point_direction_check_block_open.
+
+All rows, columns and diagonals of the board are gathered into one
+two-dimensional array with a single fancy-indexing step,
+using a table of point indices which is computed once per board size.
+Every line is padded with BORDER points, two in front and at least
+two at the end. The per-point walks of the original checks are then
+computed for every point of every line at once from run lengths.
+"""
+
+import numpy as np
+from board_util import EMPTY, coord_to_point
+
+# Index of a point which is BORDER on every board size, used as padding
+PAD_POINT = 0
+
+_line_tables = {}
+
+def line_table(size):
+    """
+    Return the line table for boards of the given size.
+    Each row of the table lists the points of one line of the board
+    in order, padded with PAD_POINT.
+    """
+    table = _line_tables.get(size)
+    if table is None:
+        table = _build_line_table(size)
+        _line_tables[size] = table
+    return table
+
+def _build_line_table(size):
+    def pt(row, col):
+        return coord_to_point(row, col, size)
+    lines = []
+    for i in range(1, size + 1):
+        lines.append([pt(i, col) for col in range(1, size + 1)])
+        lines.append([pt(row, i) for row in range(1, size + 1)])
+    # diagonals: starting points on the first row and the first/last column
+    for start_row, start_col in [(1, col) for col in range(1, size + 1)] + \
+                                [(row, 1) for row in range(2, size + 1)]:
+        lines.append([pt(start_row + k, start_col + k)
+                      for k in range(size + 1 - max(start_row, start_col))])
+    for start_row, start_col in [(1, col) for col in range(1, size + 1)] + \
+                                [(row, size) for row in range(2, size + 1)]:
+        length = min(size + 1 - start_row, start_col)
+        lines.append([pt(start_row + k, start_col - k)
+                      for k in range(length)])
+    width = size + 4
+    table = np.full((len(lines), width), PAD_POINT, dtype = np.intp)
+    for i, line in enumerate(lines):
+        table[i, 2 : 2 + len(line)] = line
+    return table
+
+def _forward_walks(lines, color):
+    """
+    For every position i of every line, look at the walk from i
+    towards the end of the line, as done by the per-point checks.
+    Returns:
+        run1: number of stones of color directly after i
+        run2: number of stones of color directly after the first
+              non-color point, which is the point at i + run1 + 1
+        empty: whether that first non-color point is EMPTY
+    Only positions holding a stone of color are meaningful.
+    """
+    num_lines, width = lines.shape
+    positions = np.arange(width)
+    # offset of each line in the flattened arrays
+    offsets = (np.arange(num_lines) * width)[:, None]
+    is_color = lines == color
+    # first non-color position at or after each position.
+    # The last position is always BORDER, so this is defined everywhere.
+    breaks = np.where(is_color, width - 1, positions)
+    next_break = np.minimum.accumulate(breaks[:, ::-1], axis = 1)[:, ::-1]
+    first = np.empty_like(next_break)
+    first[:, :-1] = next_break[:, 1:]
+    first[:, -1] = width - 1
+    run1 = first - positions - 1
+    empty = lines.ravel()[first + offsets] == EMPTY
+    after = np.minimum(first + 1, width - 1)
+    run2 = next_break.ravel()[after + offsets] - first - 1
+    run2 *= empty
+    return run1, run2, empty
+
+def pattern_points(board, color):
+    """
+    For the stones of color on board, find which of them pass
+    point_check_block_win_gomoku, point_check_open_four_gomoku and
+    point_check_block_open_four_gomoku of SimpleGoBoard.
+    Returns three boolean arrays indexed by point.
+    """
+    table = line_table(board.size)
+    lines = board.board[table]
+    fwd = _forward_walks(lines, color)
+    bwd = [a[:, ::-1] for a in _forward_walks(lines[:, ::-1], color)]
+    (run1_f, run2_f, empty_f), (run1_b, run2_b, empty_b) = fwd, bwd
+
+    # _point_direction_check_block_win: four stones counting through
+    # one empty point, in either direction
+    block_win = (empty_f & (run1_f + run2_f >= 3)) | \
+                (empty_b & (run1_b + run2_b >= 3))
+
+    # _point_direction_check_open: a run of at most four stones ending
+    # on an empty point on both sides, with four stones on one side
+    open_f = empty_f & (run1_f <= 3)
+    open_b = empty_b & (run1_b <= 3)
+    open_four = open_f & open_b & ((run1_f == 3) | (run1_b == 3))
+
+    # _point_direction_check_block_open: reaching an empty point
+    # before three stones on both sides, with three stones counting
+    # through that empty point on one side
+    block_f = empty_f & (run1_f <= 2)
+    block_b = empty_b & (run1_b <= 2)
+    block_open = block_f & block_b & \
+                 ((run1_f + run2_f >= 2) | (run1_b + run2_b >= 2))
+
+    is_color = lines == color
+    results = []
+    for found in (block_win, open_four, block_open):
+        points = np.zeros(board.maxpoint, dtype = bool)
+        points[table[is_color & found]] = True
+        results.append(points)
+    return results
+
+def count_patterns(board, color):
+    """
+    Number of stones of color for which each of the three checks holds,
+    in the order block win, open four, block open four.
+    """
+    return [int(np.count_nonzero(points))
+            for points in pattern_points(board, color)]
@@ -4,6 +4,7 @@ Utility functions for Go board.
 """
 
 import numpy as np
+import random
 
 """
 Encoding of colors on and off a Go board.
@@ -89,6 +90,146 @@ def coord_to_point(row, col, boardsize):
     NS = boardsize + 1
     return NS * row + col
 
+"""
+Length-5 windows of the board, cached per board size by five_windows.
+"""
+_five_windows = {}
+
+def five_windows(boardsize):
+    """
+    Return all length-5 windows of a board of the given size.
+
+    Returns
+    -------
+    windows: numpy array of shape (number of windows, 5)
+        the points of each horizontal, vertical and diagonal window,
+        in order along the line
+    point_windows: list indexed by point
+        for each point, a tuple of the indices of the windows through it.
+        Empty for BORDER points.
+    """
+    if boardsize not in _five_windows:
+        NS = boardsize + 1
+        maxpoint = boardsize * boardsize + 3 * NS
+        windows = []
+        # (shift, row step, col step) of the four line directions
+        for shift, drow, dcol in [(1, 0, 1), (NS, 1, 0),
+                                  (NS + 1, 1, 1), (NS - 1, 1, -1)]:
+            for row in range(1, boardsize + 1):
+                for col in range(1, boardsize + 1):
+                    if 1 <= row + 4 * drow <= boardsize and \
+                       1 <= col + 4 * dcol <= boardsize:
+                        start = coord_to_point(row, col, boardsize)
+                        windows.append([start + k * shift for k in range(5)])
+        point_windows = [[] for _ in range(maxpoint)]
+        for w, window in enumerate(windows):
+            for point in window:
+                point_windows[point].append(w)
+        windows = np.array(windows, dtype = np.intp).reshape(-1, 5)
+        point_windows = [tuple(ws) for ws in point_windows]
+        _five_windows[boardsize] = (windows, point_windows)
+    return _five_windows[boardsize]
+
+"""
+Chebyshev neighbourhoods of the board points,
+cached per board size and radius by neighbourhoods.
+"""
+_neighbourhoods = {}
+
+# Default radius of the candidate moves around the stones
+CANDIDATE_RADIUS = 2
+
+def neighbourhoods(boardsize, radius):
+    """
+    Return a list indexed by point: for each point, a tuple of the
+    other points at most radius rows and radius columns away.
+    Empty for BORDER points.
+    """
+    key = (boardsize, radius)
+    if key not in _neighbourhoods:
+        maxpoint = boardsize * boardsize + 3 * (boardsize + 1)
+        table = [()] * maxpoint
+        for row in range(1, boardsize + 1):
+            for col in range(1, boardsize + 1):
+                near = []
+                for r in range(max(1, row - radius),
+                               min(boardsize, row + radius) + 1):
+                    for c in range(max(1, col - radius),
+                                   min(boardsize, col + radius) + 1):
+                        if (r, c) != (row, col):
+                            near.append(coord_to_point(r, c, boardsize))
+                table[coord_to_point(row, col, boardsize)] = tuple(near)
+        _neighbourhoods[key] = table
+    return _neighbourhoods[key]
+
+class PointSet(object):
+    """
+    A set of board points stored in a list, together with the
+    position of each point in that list.
+    Adding, removing and picking a random point are all O(1):
+    a point is removed by moving the last point of the list into its slot.
+    restore undoes the most recent remove of a point, putting it back
+    into its old slot, so that a sequence of removes followed by the
+    restores in reverse order leaves the list order unchanged.
+    """
+    def __init__(self, maxpoint, points = ()):
+        self.points = []
+        self.index = [NULLPOINT] * maxpoint
+        for point in points:
+            self.add(point)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, point):
+        i = self.index[point]
+        return i < len(self.points) and self.points[i] == point
+
+    def copy(self):
+        s = PointSet.__new__(PointSet)
+        s.points = list(self.points)
+        s.index = list(self.index)
+        return s
+
+    def add(self, point):
+        self.index[point] = len(self.points)
+        self.points.append(point)
+
+    def remove(self, point):
+        """
+        Remove point. Its old position is kept in index for restore.
+        """
+        i = self.index[point]
+        last = self.points.pop()
+        if last != point:
+            self.points[i] = last
+            self.index[last] = i
+
+    def restore(self, point):
+        """
+        Undo the most recent remove of point.
+        """
+        i = self.index[point]
+        if i == len(self.points):
+            self.points.append(point)
+        else:
+            moved = self.points[i]
+            self.index[moved] = len(self.points)
+            self.points.append(moved)
+            self.points[i] = point
+
+    def random_point(self, rng = None):
+        """
+        Return a random point of the set, or PASS if the set is empty.
+        It is drawn from the random.Random rng, or from the random
+        module by default.
+        """
+        if not self.points:
+            return PASS
+        if rng is None:
+            rng = random
+        return self.points[rng.randrange(len(self.points))]
+
 class GoBoardUtil(object):
     
     @staticmethod
@@ -116,23 +257,30 @@ class GoBoardUtil(object):
         """
         generate a list of all legal moves on the board for gomoku, where
         all empty positions are legal.
+        The list is a new list, so callers may modify it.
         """
-        moves = board.get_empty_points()
-        legal_moves = []
-        for move in moves:
-            legal_moves.append(move)
-        return legal_moves
+        return board.empty_point_list()
+
+    @staticmethod
+    def generate_candidate_moves_gomoku(board):
+        """
+        generate a list of the empty points near a stone, see
+        SimpleGoBoard.candidate_point_list, or of all empty points
+        if there are none, such as on the empty board.
+        The list is a new list, so callers may modify it.
+        """
+        moves = board.candidate_point_list()
+        if not moves:
+            moves = board.empty_point_list()
+        return moves
             
     @staticmethod
     def generate_random_move_gomoku(board):
         """
         Generate a random move for the game of Gomoku.
+        Return PASS if the board is full.
         """
-        moves = board.get_empty_points()
-        if len(moves) == 0:
-            return PASS
-        np.random.shuffle(moves)
-        return moves[0]
+        return board.random_empty_point()
 
     @staticmethod       
     def generate_random_move(board, color, use_eye_filter):
@@ -7,19 +7,59 @@ in the Deep-Go project by Isaac Henrion and Amos Storkey
 at the University of Edinburgh.
 """
 import traceback
+import queue
+import random
+import threading
+import time
+import sys
 from sys import stdin, stdout, stderr
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, PASS, \
                        MAXSIZE, coord_to_point
+from batch_playout import simulate_moves, MAX_BATCH
+from parallel_sim import SimulationPool
+from time_control import TimeControl
+import root_selection
+from mcts import MCTS, random_playout
+from transposition import TranspositionTable, DEFAULT_MB, child_key, \
+                          key_salt, visits_depth
+from lru_cache import LRUCache
+from threat_search import ThreatSolver
+import local_patterns
+from alphabeta import AlphaBeta
 import numpy as np
 import re
 
+# Default policy of genmove
 POLICY = "random"
-STACK = list()
-STACK1 = list()
+# Commands the command reader answers at once while genmove is searching,
+# see start_connection
+INSTANT_COMMANDS = ["name", "version", "protocol_version", "known_command",
+                    "list_commands", "showboard", "stop"]
+# Commands after which batch mode writes out its responses
+FLUSH_COMMANDS = ["genmove", "quit"]
+# Bytes read from standard input at once in batch mode
+BATCH_READ_SIZE = 1 << 16
+SELECTIONS = ["uniform", "ucb1", "halving"]
+POLICIES = ["random", "rule_based", "mcts", "alphabeta"]
+# Policies which search in this process only, whatever the workers
+SERIAL_POLICIES = ["mcts", "alphabeta"]
+SOLVERS = ["off", "vcf", "vct"]
+# Longest time a pondering simulation runs before checking whether
+# it has to stop
+PONDER_SLICE = 0.05
+# Number of positions whose check_block_win result is cached.
+# An entry takes about 300 bytes on 7x7 to 19x19 boards, since the
+# move lists of Random results are not kept, so about 30 MB in all.
+BLOCK_WIN_CACHE_SIZE = 100000
+BLOCK_WIN_CACHE = LRUCache(BLOCK_WIN_CACHE_SIZE)
+# Largest distance of a move which changes a pattern count to a stone
+PATTERN_RADIUS = 2
 
 class GtpConnection():
 
-    def __init__(self, go_engine, board, debug_mode = False):
+    def __init__(self, go_engine, board, debug_mode = False,
+                 num_workers = 1, seed = None, outfile = None,
+                 batch_mode = False):
         """
         Manage a GTP connection for a Go-playing engine
 
@@ -29,10 +69,76 @@ class GtpConnection():
             a program that can reply to a set of GTP commandsbelow
         board: 
             Represents the current board state.
+        num_workers:
+            number of processes running the genmove simulations
+        seed:
+            if given, genmove simulations are seeded with it, and
+            genmove is deterministic for any number of workers.
+            The simulations in this process draw from the random.Random
+            rng of the connection, not the random module, so games of
+            other connections in the same process do not change them.
+        outfile:
+            stream the GTP responses are written to, stdout by default
+        batch_mode:
+            read commands in large chunks and hold back responses,
+            see start_connection
         """
         self._debug_mode = debug_mode
         self.go_engine = go_engine
         self.board = board
+        self.outfile = stdout if outfile is None else outfile
+        # responses may be written by the command reader thread as well
+        self._output_lock = threading.Lock()
+        # number of the command each thread runs, echoed in its response
+        self._command_id = threading.local()
+        # in batch mode, the responses not written out yet
+        self.batch_mode = batch_mode
+        self._held_output = []
+        # set by the stop command to end the search of genmove early
+        self._search_stop = threading.Event()
+        # numbers of the genmove commands read from standard input,
+        # started and finished, and of the last one a stop was read for
+        self._genmoves_read = 0
+        self._genmoves_started = 0
+        self._genmoves_done = 0
+        self._genmoves_stopped = 0
+        self._genmove_lock = threading.Lock()
+        # whether genmove is searching, and the board it searches
+        self._searching = False
+        self._thinking_board = None
+        # simulation or search policy of genmove
+        self.policy = POLICY
+        # number of simulations per legal move in genmove
+        self.num_simulations = 10
+        self.num_workers = num_workers
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self._pool = None
+        self.time_control = TimeControl()
+        # how genmove spreads the playouts over the legal moves
+        self.selection = "uniform"
+        # moves and root_selection.MoveStats of the last genmove
+        self.root_moves = []
+        self.root_stats = None
+        # search results of genmove, by position
+        self.tt = TranspositionTable(DEFAULT_MB)
+        # forced win search run by genmove before any simulations
+        self.solver = "vcf"
+        self.threat_solver = ThreatSolver()
+        # search tree of the mcts policy, kept between moves
+        self.mcts = MCTS(tt = self.tt, salt = key_salt("mcts random"),
+                         rng = self.rng)
+        # search of the alphabeta policy
+        self.alphabeta = AlphaBeta(tt = self.tt,
+                                   salt = key_salt("alphabeta"))
+        # background search on the opponent's time, see start_ponder
+        self.ponder = False
+        # if set, a threading.Semaphore shared with other connections,
+        # and only connections which get a slot ponder
+        self.ponder_slots = None
+        self._ponder_thread = None
+        self._ponder_stop = None
+        self._ponder_color = None
         self.commands = {
             "protocol_version": self.protocol_version_cmd,
             "quit": self.quit_cmd,
@@ -55,7 +161,28 @@ class GtpConnection():
             "gogui-rules_final_result": self.gogui_rules_final_result_cmd,
             "gogui-analyze_commands": self.gogui_analyze_cmd,
             "policy": self.policy_cmd,
-            "policy_moves": self.policy_moves
+            "policy_moves": self.policy_moves,
+            "simulations": self.simulations_cmd,
+            "workers": self.workers_cmd,
+            "seed": self.seed_cmd,
+            "time_settings": self.time_settings_cmd,
+            "time_left": self.time_left_cmd,
+            "time_limit": self.time_limit_cmd,
+            "selection": self.selection_cmd,
+            "root_stats": self.root_stats_cmd,
+            "mcts_playout": self.mcts_playout_cmd,
+            "tt_size": self.tt_size_cmd,
+            "tt_stats": self.tt_stats_cmd,
+            "blockwin_cache_size": self.blockwin_cache_size_cmd,
+            "blockwin_cache_stats": self.blockwin_cache_stats_cmd,
+            "solver": self.solver_cmd,
+            "solver_limits": self.solver_limits_cmd,
+            "alphabeta_depth": self.alphabeta_depth_cmd,
+            "alphabeta_stats": self.alphabeta_stats_cmd,
+            "candidate_radius": self.candidate_radius_cmd,
+            "playout_cost": self.playout_cost_cmd,
+            "ponder": self.ponder_cmd,
+            "stop": self.stop_cmd
         }
 
         # used for argument checking
@@ -67,36 +194,178 @@ class GtpConnection():
             "known_command": (1, 'Usage: known_command CMD_NAME'),
             "genmove": (1, 'Usage: genmove {w,b}'),
             "play": (2, 'Usage: play {b,w} MOVE'),
-            "legal_moves": (1, 'Usage: legal_moves {w,b}')
+            "legal_moves": (1, 'Usage: legal_moves {w,b}'),
+            "simulations": (1, 'Usage: simulations INT'),
+            "workers": (1, 'Usage: workers INT'),
+            "seed": (1, 'Usage: seed {INT,none}'),
+            "time_settings": (3, 'Usage: time_settings MAIN_TIME '
+                                 'BYO_YOMI_TIME BYO_YOMI_STONES'),
+            "time_left": (3, 'Usage: time_left {w,b} TIME STONES'),
+            "time_limit": (1, 'Usage: time_limit {SECONDS,none}'),
+            "selection": (1, 'Usage: selection {uniform,ucb1,halving}'),
+            "mcts_playout": (1, 'Usage: mcts_playout {random,rule_based}'),
+            "tt_size": (1, 'Usage: tt_size MB'),
+            "blockwin_cache_size": (1, 'Usage: blockwin_cache_size INT'),
+            "solver": (1, 'Usage: solver {off,vcf,vct}'),
+            "solver_limits": (2, 'Usage: solver_limits NODES SECONDS'),
+            "alphabeta_depth": (1, 'Usage: alphabeta_depth INT'),
+            "candidate_radius": (1, 'Usage: candidate_radius INT'),
+            "playout_cost": (2, 'Usage: playout_cost {random,rule_based} INT'),
+            "ponder": (1, 'Usage: ponder {on,off}')
         }
     
     def write(self, data):
-        stdout.write(data) 
+        with self._output_lock:
+            if self.batch_mode:
+                self._held_output.append(data)
+            else:
+                self.outfile.write(data) 
 
     def flush(self):
-        stdout.flush()
+        with self._output_lock:
+            if self._held_output:
+                self.outfile.write(''.join(self._held_output))
+                self._held_output = []
+            self.outfile.flush()
+
+    def _send(self, data):
+        """
+        Write data and flush it, except in batch mode
+        """
+        with self._output_lock:
+            if self.batch_mode:
+                self._held_output.append(data)
+            else:
+                self.outfile.write(data)
+                self.outfile.flush()
 
     def start_connection(self):
         """
-        Start a GTP connection. 
-        This function continuously monitors standard input for commands.
+        Start a GTP connection.
+        In batch mode see _batch_connection. Otherwise a reader
+        thread continuously monitors standard input for commands,
+        which are executed here in order. While genmove is searching,
+        the reader answers the INSTANT_COMMANDS itself if no other
+        command is waiting, and quit stops the search first.
+        A stop ends the genmoves read before it, even those which have
+        not started searching yet, and no later one.
+        """
+        if self.batch_mode:
+            self._batch_connection()
+            return
+        commands = queue.Queue()
+        reader = threading.Thread(target = self._read_commands,
+                                  args = (commands,))
+        reader.daemon = True
+        reader.start()
+        line = commands.get()
+        while line is not None:
+            if command_name(line) == "genmove":
+                self._run_genmove(line)
+            else:
+                self.get_cmd(line)
+            line = commands.get()
+        self.stop_ponder()
+
+    def _batch_connection(self):
+        """
+        Run the commands of standard input for regression scripts.
+        Input is read in chunks of up to BATCH_READ_SIZE bytes from
+        the binary buffer, and responses are held back until a
+        FLUSH_COMMANDS command, or until all complete lines read so
+        far are done and more input has to be waited for.
+        """
+        pending = b''
+        while True:
+            chunk = stdin.buffer.read1(BATCH_READ_SIZE)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                line = line.decode("utf-8", "replace")
+                self.get_cmd(line)
+                if command_name(line) in FLUSH_COMMANDS:
+                    self.flush()
+            self.flush()
+        if pending:
+            self.get_cmd(pending.decode("utf-8", "replace"))
+        self.flush()
+        self.stop_ponder()
+
+    def _read_commands(self, commands):
+        """
+        Put the lines of standard input into the commands queue,
+        and None at the end.
+        During genmove, INSTANT_COMMANDS are run here at once. They
+        bypass get_cmd, since pausing and resuming pondering is up to
+        the main thread.
+        """
+        for line in iter(stdin.readline, ''):
+            name = command_name(line)
+            with self._genmove_lock:
+                if name == "genmove":
+                    self._genmoves_read += 1
+                elif name == "stop" and \
+                     self._genmoves_read > self._genmoves_done:
+                    self._genmoves_stopped = self._genmoves_read
+                    if self._genmoves_started > self._genmoves_done:
+                        self._search_stop.set()
+                    self._execute(line)
+                    continue
+            if self._searching and commands.empty() and \
+               name in INSTANT_COMMANDS:
+                self._execute(line)
+                continue
+            if name == "quit":
+                self._search_stop.set()
+            commands.put(line)
+        commands.put(None)
+
+    def _run_genmove(self, line):
+        """
+        Run a genmove line read by _read_commands, which is stopped
+        at once if a stop for it was read already
         """
-        line = stdin.readline()
-        while line:
+        with self._genmove_lock:
+            self._genmoves_started += 1
+            if self._genmoves_stopped >= self._genmoves_started:
+                self._search_stop.set()
+            else:
+                self._search_stop.clear()
+        try:
             self.get_cmd(line)
-            line = stdin.readline()
+        finally:
+            with self._genmove_lock:
+                self._genmoves_done += 1
+                self._search_stop.clear()
 
     def get_cmd(self, command):
         """
-        Parse command string and execute it
+        Parse command string and execute it.
+        Pondering is paused while the command runs, and goes on
+        afterwards if the command did not change the position.
         """
         if len(command.strip(' \r\t')) == 0:
             return
         if command[0] == '#':
             return
-        # Strip leading numbers from regression tests
-        if command[0].isdigit():
-            command = re.sub("^\d+", "", command).lstrip()
+        ponder_color = self.stop_ponder()
+        position = (self.board.move_number(), self.board.zobrist_key)
+        try:
+            self._execute(command)
+        finally:
+            if ponder_color is not None and self.ponder and \
+               self._ponder_thread is None and position == \
+               (self.board.move_number(), self.board.zobrist_key):
+                self.start_ponder(ponder_color)
+
+    def _execute(self, command):
+        # Strip leading numbers from regression tests,
+        # the response repeats them
+        number = re.match(r"^\d*", command).group()
+        command = command[len(number):].lstrip()
+        self._command_id.value = number
 
         elements = command.split()
         if not elements:
@@ -115,7 +384,7 @@ class GtpConnection():
         else:
             self.debug_msg("Unknown command: {}\n".format(command_name))
             self.error('Unknown command')
-            stdout.flush()
+            self.flush()
 
     def has_arg_error(self, cmd, argnum):
         """
@@ -134,14 +403,16 @@ class GtpConnection():
             stderr.flush()
 
     def error(self, error_msg):
-        """ Send error msg to stdout """
-        stdout.write('? {}\n\n'.format(error_msg))
-        stdout.flush()
+        """ Send error msg to the output stream """
+        self._send('?{} {}\n\n'.format(self._response_id(), error_msg))
 
     def respond(self, response=''):
-        """ Send response to stdout """
-        stdout.write('= {}\n\n'.format(response))
-        stdout.flush()
+        """ Send response to the output stream """
+        self._send('={} {}\n\n'.format(self._response_id(), response))
+
+    def _response_id(self):
+        """ Number of the command being run by this thread, or '' """
+        return getattr(self._command_id, "value", '')
 
     def reset(self, size):
         """
@@ -158,8 +429,12 @@ class GtpConnection():
 
     def quit_cmd(self, args):
         """ Quit game and exit the GTP interface """
+        self.stop_ponder()
+        self.ponder = False
+        self.close_pool()
         self.respond()
-        exit()
+        self.flush()
+        sys.exit()
 
     def name_cmd(self, args):
         """ Return the name of the Go engine """
@@ -172,6 +447,7 @@ class GtpConnection():
     def clear_board_cmd(self, args):
         """ clear the board """
         self.reset(self.board.size)
+        self.time_control.new_game()
         self.respond()
 
     def boardsize_cmd(self, args):
@@ -182,7 +458,11 @@ class GtpConnection():
         self.respond()
 
     def showboard_cmd(self, args):
-        self.respond('\n' + self.board2d())
+        # during genmove, self.board holds the moves being simulated
+        board = self._thinking_board
+        if board is None:
+            board = self.board2d()
+        self.respond('\n' + board)
 
     def komi_cmd(self, args):
         """
@@ -245,6 +525,7 @@ class GtpConnection():
                 self.respond("illegal move: \"{}\" occupied".format(board_move))
                 return
             else:
+                self.mcts.update_with_move(move, color)
                 self.debug_msg("Move: {}\nBoard:\n{}\n".
                                 format(board_move, self.board2d()))
             self.respond()
@@ -255,53 +536,40 @@ class GtpConnection():
         """
         Generate a move for the color args[0] in {'b', 'w'}, for the game of gomoku.
         """
+        start = time.time()
         board_color = args[0].lower()
         color = color_to_int(board_color)
-        game_end, winner = self.board.check_game_end_gomoku()
-        if game_end:
+        winner = self.board.winner
+        if winner is not None:
             if winner == color:
                 self.respond("pass")
             else:
                 self.respond("resign")
             return
-        moves = GoBoardUtil.generate_legal_moves_gomoku(self.board)
+        # only moves near the stones are considered.
+        # Ties go to the first move in point order.
+        moves = sorted(GoBoardUtil.generate_candidate_moves_gomoku(self.board))
+        if len(moves) == 0:
+            self.respond("pass")
+            return
 
+        # with a time budget, simulate until it is used up.
+        # The stop command ends the search early.
+        budget = self.time_control.budget(color, len(self.board.empty_set))
+        deadline = None
+        if budget is not None:
+            deadline = start + budget
+        # the reader thread shows this snapshot until the move is played
+        self._thinking_board = self.board2d()
+        self._searching = True
+        try:
+            best_move = self.search_move(color, moves, deadline)
+            self._play_generated_move(best_move, color, start)
+        finally:
+            self._searching = False
+            self._thinking_board = None
 
-        #IF RANDOM
-        if (POLICY == "random"):
-            best_move = None
-            best_ratio = 0
-            for move in moves:
-                wins = 0
-                if best_move == None:
-                    best_move = move
-                for i in range(0,10):
-                    if random_simulation(self.board.copy(), color, color):
-                        wins += 1
-
-                if (wins/10) > best_ratio:
-                    best_move = move
-                    best_ratio = (wins/10)
-
-        #IF RULES
-        elif (POLICY == "rule_based"):
-            best_move = None
-            best_ratio = 0
-            for move in moves:
-                temp_board = self.board.copy()
-                temp_board.play_move_gomoku(move, color)
-                wins = 0
-                if best_move == None:
-                    best_move = move
-                for i in range(0,10):
-                    outcome = rules_simulation(temp_board.copy(), color, GoBoardUtil.opponent(color))
-                    wins += outcome
-
-                if (wins/10) > best_ratio:
-                    best_move = move
-                    best_ratio = (wins/10)
-            
-        
+    def _play_generated_move(self, best_move, color, start):
         if best_move == PASS:
             self.respond("pass")
             return
@@ -309,10 +577,262 @@ class GtpConnection():
         move_as_string = format_point(move_coord)
         if self.board.is_legal_gomoku(best_move, color):
             self.board.play_move_gomoku(best_move, color)
+            self.mcts.update_with_move(best_move, color)
+            self.time_control.used(color, time.time() - start)
             self.respond(move_as_string)
+            if self.ponder and self.board.winner is None:
+                self.start_ponder(color)
         else:
             self.respond("illegal move: {}".format(move_as_string))
 
+    def search_move(self, color, moves, deadline):
+        """
+        Best move for color among moves, found by the solver or the
+        current policy, within the deadline or until stopped
+        """
+        stop = self._search_stop
+        # a proven forced win is played without any simulations
+        best_move = None
+        if self.solver != "off":
+            best_move = self.threat_solver.solve(self.board, color,
+                                                 self.solver == "vct",
+                                                 deadline, stop)
+            if best_move is not None:
+                self.root_moves = []
+                self.root_stats = None
+                self.debug_msg("Forced win found in {} nodes\n"
+                               .format(self.threat_solver.nodes))
+        if best_move is None and self.policy == "alphabeta":
+            best_move = self.alphabeta.search(self.board, color, deadline,
+                                              stop)
+            self.root_moves = []
+            self.root_stats = None
+            self.debug_msg("Alpha-beta: depth {}, {} nodes, {:.0f} nodes/s\n"
+                           .format(self.alphabeta.depth, self.alphabeta.nodes,
+                                   self.alphabeta.nps))
+        if best_move is None:
+            best, stats = self.select_root_move(color, moves, deadline)
+            self.root_moves = moves
+            self.root_stats = stats
+            self.debug_msg("Playouts: {} total, {} for the chosen move\n"
+                           .format(stats.total, stats.visits[best]))
+            best_move = moves[best]
+        return best_move
+
+    def evaluate_moves(self, color, moves, deadline = None,
+                       num_simulations = None, seed = None):
+        """
+        Simulate moves for color with the current policy,
+        in the worker pool if there is more than one worker.
+        num_simulations playouts are run per move, until the deadline.
+        Without a deadline, num_simulations defaults to the setting of
+        the simulations command, otherwise to no limit. seed defaults
+        to the setting of the seed command.
+        The stop command ends the simulations early, in the workers too.
+        Returns [wins, simulations] for each move.
+        """
+        if num_simulations is None and deadline is None:
+            num_simulations = self.num_simulations
+        if seed is None:
+            seed = self.seed
+        options = {"policy": self.policy,
+                   "num_simulations": num_simulations,
+                   "seed": seed,
+                   "deadline": deadline}
+        if self.num_workers > 1:
+            if self._pool is None:
+                self._pool = SimulationPool(self.num_workers)
+            return self._pool.evaluate(evaluate_moves, self.board, color,
+                                       moves, stop = self._search_stop,
+                                       **options)
+        return evaluate_moves(self.board, color, moves,
+                              stop = self._search_stop, rng = self.rng,
+                              **options)
+
+    def select_root_move(self, color, moves, deadline = None):
+        """
+        Simulate moves for color as set by the selection mode.
+        Returns the index of the chosen move and the root_selection.MoveStats.
+        """
+        if self.policy == "mcts":
+            return self.search_tree(color, moves, deadline)
+        stats = self.probe_moves(color, moves)
+        if self.selection == "uniform":
+            # moves with enough stored playouts are not simulated again,
+            # unless there is a time budget to use up
+            indices = [i for i in range(len(moves))
+                       if deadline is not None or
+                       stats.visits[i] < self.num_simulations]
+            stats.add(indices, self.evaluate_moves(
+                color, [moves[i] for i in indices], deadline))
+            self.store_moves(color, moves, stats)
+            best = max(range(len(moves)), key = stats.mean)
+            return best, stats
+
+        calls = [0]
+        def simulate(indices, n):
+            # a new seed for every call, so playouts are not repeated
+            seed = None
+            if self.seed is not None:
+                seed = self.seed * 1000003 + calls[0]
+            calls[0] += 1
+            return self.evaluate_moves(color, [moves[i] for i in indices],
+                                       deadline, n, seed)
+        max_playouts = self.num_simulations * len(moves)
+        if self.selection == "ucb1":
+            if deadline is not None:
+                max_playouts = None
+            best, stats = root_selection.ucb1(simulate, len(moves),
+                                              max_playouts, deadline,
+                                              max(1, len(moves) // 8),
+                                              stats = stats,
+                                              stop = self._search_stop)
+        else:
+            assert self.selection == "halving"
+            best, stats = root_selection.successive_halving(
+                simulate, len(moves), max_playouts, deadline, stats = stats,
+                stop = self._search_stop)
+        self.store_moves(color, moves, stats)
+        return best, stats
+
+    def probe_moves(self, color, moves, board = None):
+        """
+        MoveStats with the playouts stored in the transposition table
+        for the positions after each of the moves of color,
+        on board or by default self.board
+        """
+        if board is None:
+            board = self.board
+        stats = root_selection.MoveStats(len(moves))
+        salt = key_salt(self.policy)
+        results = []
+        for move in moves:
+            entry = self.tt.probe(child_key(board, color, move, salt))
+            if entry is None:
+                results.append((0.0, 0))
+            else:
+                value, visits, _, _ = entry
+                results.append((value * visits, visits))
+        stats.add(range(len(moves)), results)
+        return stats
+
+    def store_moves(self, color, moves, stats, board = None):
+        """
+        Store the playouts of stats in the transposition table,
+        for the moves of color on board or by default self.board
+        """
+        if board is None:
+            board = self.board
+        salt = key_salt(self.policy)
+        for i, move in enumerate(moves):
+            if stats.visits[i] > 0:
+                self.tt.store(child_key(board, color, move, salt),
+                              stats.mean(i), stats.visits[i], 0,
+                              visits_depth(stats.visits[i]))
+
+    def search_tree(self, color, moves, deadline = None):
+        """
+        Run the MCTS search of the mcts policy, with the same number of
+        playouts as uniform selection, or until the deadline.
+        Returns the index of the most visited move and the MoveStats
+        of the root children.
+        """
+        if self.seed is not None:
+            self.rng.seed("{} {}".format(self.seed, self.board.move_number()))
+        max_playouts = None
+        if deadline is None:
+            max_playouts = self.num_simulations * len(moves)
+        best_move = self.mcts.search(self.board, color, max_playouts, deadline,
+                                     self._search_stop)
+        stats = self.mcts.root_move_stats(moves)
+        if best_move in moves:
+            best = moves.index(best_move)
+        else:
+            # a child kept from the last tree may not be a move now,
+            # e.g. after candidate_radius changed
+            best = max(range(len(moves)), key = lambda i: stats.visits[i])
+        return best, stats
+
+    def start_ponder(self, color):
+        """
+        Search in a background thread until stop_ponder, with the
+        opponent of color to play. With the mcts policy the tree
+        below the current root is grown, so play keeps the subtree of
+        the actual reply. With the simulation policies the moves of
+        color after each likely reply are simulated and stored in the
+        transposition table, where genmove finds them.
+        The alphabeta policy does not ponder, and neither does a
+        connection which finds no free ponder_slots.
+        """
+        if self.policy == "alphabeta":
+            return
+        if self.ponder_slots is not None and \
+           not self.ponder_slots.acquire(blocking = False):
+            return
+        self._ponder_color = color
+        self._ponder_stop = threading.Event()
+        self._ponder_thread = threading.Thread(
+            target = self._ponder, args = (self.board.copy(), color,
+                                           self._ponder_stop))
+        self._ponder_thread.daemon = True
+        self._ponder_thread.start()
+
+    def stop_ponder(self):
+        """
+        Stop pondering and wait for the thread to finish.
+        Returns the color pondering was for, or None if it was not on.
+        """
+        if self._ponder_thread is None:
+            return None
+        self._ponder_stop.set()
+        self._ponder_thread.join()
+        self._ponder_thread = None
+        return self._ponder_color
+
+    def _ponder(self, board, color, stop):
+        try:
+            self._ponder_search(board, color, stop)
+        finally:
+            if self.ponder_slots is not None:
+                self.ponder_slots.release()
+
+    def _ponder_search(self, board, color, stop):
+        opp_color = GoBoardUtil.opponent(color)
+        if self.policy == "mcts":
+            self.mcts.search(board, opp_color, stop = stop)
+            return
+        for reply in likely_replies(board, opp_color):
+            if stop.is_set():
+                return
+            board.play_move_gomoku(reply, opp_color)
+            if board.winner is None:
+                self._ponder_moves(board, color, stop)
+            board.undo_move()
+
+    def _ponder_moves(self, board, color, stop):
+        """
+        Simulate the moves of color on board, in slices of at most
+        PONDER_SLICE seconds, up to num_simulations playouts per move
+        including the stored ones
+        """
+        moves = sorted(GoBoardUtil.generate_candidate_moves_gomoku(board))
+        stats = self.probe_moves(color, moves, board)
+        for i, move in enumerate(moves):
+            while stats.visits[i] < self.num_simulations:
+                if stop.is_set():
+                    self.store_moves(color, moves, stats, board)
+                    return
+                stats.add([i], evaluate_moves(
+                    board, color, [move], self.policy,
+                    self.num_simulations - stats.visits[i], self.seed,
+                    time.time() + PONDER_SLICE, rng = self.rng))
+        self.store_moves(color, moves, stats, board)
+
+    def close_pool(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
     def gogui_rules_game_id_cmd(self, args):
         self.respond("Gomoku")
     
@@ -369,9 +889,9 @@ class GtpConnection():
         self.respond(str)
     
     def gogui_rules_final_result_cmd(self, args):
-        game_end, winner = self.board.check_game_end_gomoku()
-        moves = self.board.get_empty_points()
-        board_full = (len(moves) == 0)
+        winner = self.board.winner
+        game_end = winner is not None
+        board_full = (len(self.board.empty_set) == 0)
         if board_full and not game_end:
             self.respond("draw")
             return
@@ -391,12 +911,338 @@ class GtpConnection():
                      )
 
     def policy_cmd(self,args):
-        if args[0] != "random" and args[0] != "rule_based":
+        if args[0] not in POLICIES:
             self.respond("unknown policy")
         else:
-            global POLICY
-            POLICY = args[0]
-            self.respond("policy set to " + POLICY)
+            self.policy = args[0]
+            self.respond("policy set to " + self.policy +
+                         self._serial_note())
+
+    def _serial_note(self):
+        """
+        Note for the policy and workers responses when the worker
+        processes are not used by the current policy
+        """
+        if self.num_workers > 1 and self.policy in SERIAL_POLICIES:
+            return ", workers not used by the {} policy".format(self.policy)
+        return ""
+
+    def simulations_cmd(self, args):
+        """
+        Set the number of simulations per legal move in genmove to args[0]
+        """
+        try:
+            num_simulations = int(args[0])
+        except ValueError:
+            num_simulations = 0
+        if num_simulations <= 0:
+            self.error(self.argmap["simulations"][1])
+            return
+        self.num_simulations = num_simulations
+        self.respond("simulations set to {}".format(num_simulations))
+
+    def workers_cmd(self, args):
+        """
+        Run the genmove simulations in args[0] processes.
+        The simulation policies use them with every selection mode,
+        the SERIAL_POLICIES and the solver run in this process only.
+        """
+        try:
+            num_workers = int(args[0])
+        except ValueError:
+            num_workers = 0
+        if num_workers <= 0:
+            self.error(self.argmap["workers"][1])
+            return
+        self.close_pool()
+        self.num_workers = num_workers
+        self.respond("workers set to {}".format(num_workers) +
+                     self._serial_note())
+
+    def seed_cmd(self, args):
+        """
+        Seed the genmove simulations with args[0], or stop seeding them
+        if args[0] is none
+        """
+        if args[0].lower() == "none":
+            self.seed = None
+        else:
+            try:
+                seed = int(args[0])
+            except ValueError:
+                seed = -1
+            if seed < 0:
+                self.error(self.argmap["seed"][1])
+                return
+            self.seed = seed
+        self.rng.seed(self.seed)
+        self.respond("seed set to {}".format(self.seed))
+
+    def time_settings_cmd(self, args):
+        """
+        Set the game clock: args are main time, byo-yomi time
+        and byo-yomi stones
+        """
+        try:
+            main_time = float(args[0])
+            byo_yomi_time = float(args[1])
+            byo_yomi_stones = int(args[2])
+        except ValueError:
+            self.error(self.argmap["time_settings"][1])
+            return
+        self.time_control.set_time_settings(main_time, byo_yomi_time,
+                                            byo_yomi_stones)
+        self.respond()
+
+    def time_left_cmd(self, args):
+        """
+        Time args[1] left on the clock of color args[0] for
+        args[2] stones, or main time if args[2] is 0
+        """
+        board_color = args[0].lower()
+        try:
+            color = color_to_int(board_color)
+            time_left = float(args[1])
+            stones_left = int(args[2])
+        except (KeyError, ValueError):
+            self.error(self.argmap["time_left"][1])
+            return
+        self.time_control.set_time_left(color, time_left, stones_left)
+        self.respond()
+
+    def time_limit_cmd(self, args):
+        """
+        Spend args[0] seconds on every genmove, or go back to the
+        game clock if args[0] is none
+        """
+        if args[0].lower() == "none":
+            seconds = None
+        else:
+            try:
+                seconds = float(args[0])
+            except ValueError:
+                seconds = 0
+            if seconds <= 0:
+                self.error(self.argmap["time_limit"][1])
+                return
+        self.time_control.set_fixed(seconds)
+        self.respond("time limit set to {}".format(seconds))
+
+    def selection_cmd(self, args):
+        """
+        Set how genmove spreads its playouts over the legal moves:
+        uniform, ucb1 or halving (successive halving)
+        """
+        if args[0] not in SELECTIONS:
+            self.respond("unknown selection")
+        else:
+            self.selection = args[0]
+            self.respond("selection set to " + self.selection)
+
+    def root_stats_cmd(self, args):
+        """
+        List the moves of the last genmove with their number of playouts
+        and win rate, most simulated first
+        """
+        if self.root_stats is None:
+            self.respond()
+            return
+        stats = self.root_stats
+        order = sorted(range(len(self.root_moves)),
+                       key = lambda i: stats.visits[i], reverse = True)
+        lines = []
+        for i in order:
+            move_coord = point_to_coord(self.root_moves[i], self.board.size)
+            lines.append("{} {} {:.3f}".format(format_point(move_coord),
+                                               stats.visits[i],
+                                               max(stats.mean(i), 0)))
+        self.respond('\n'.join(lines))
+
+    def mcts_playout_cmd(self, args):
+        """
+        Set the playout policy of the mcts policy: random or rule_based
+        """
+        if args[0] == "random":
+            self.mcts.playout = random_playout
+        elif args[0] == "rule_based":
+            self.mcts.playout = rules_simulation
+        else:
+            self.error(self.argmap["mcts_playout"][1])
+            return
+        # the tree holds results of the old playouts
+        self.mcts.root = None
+        self.mcts.salt = key_salt("mcts " + args[0])
+        self.respond("mcts_playout set to " + args[0])
+
+    def tt_size_cmd(self, args):
+        """
+        Replace the transposition table by an empty one of args[0] MB
+        """
+        try:
+            megabytes = float(args[0])
+        except ValueError:
+            megabytes = 0
+        if megabytes <= 0:
+            self.error(self.argmap["tt_size"][1])
+            return
+        self.tt = TranspositionTable(megabytes)
+        self.mcts.tt = self.tt
+        self.alphabeta.tt = self.tt
+        self.respond("tt_size set to {} ({} entries)"
+                     .format(megabytes, self.tt.capacity))
+
+    def tt_stats_cmd(self, args):
+        """
+        Probes, hits, hit rate, stores and occupancy of the
+        transposition table
+        """
+        tt = self.tt
+        self.respond("probes {} hits {} hit_rate {:.3f} stores {} "
+                     "replacements {} occupancy {:.3f} ({}/{})"
+                     .format(tt.probes, tt.hits, tt.hit_rate(), tt.stores,
+                             tt.replacements, tt.occupancy(), tt.used,
+                             tt.capacity))
+
+    def blockwin_cache_size_cmd(self, args):
+        """
+        Cache the check_block_win results of at most args[0] positions,
+        0 to turn the cache off
+        """
+        try:
+            size = int(args[0])
+        except ValueError:
+            size = -1
+        if size < 0:
+            self.error(self.argmap["blockwin_cache_size"][1])
+            return
+        BLOCK_WIN_CACHE.resize(size)
+        self.respond("blockwin_cache_size set to {}".format(size))
+
+    def blockwin_cache_stats_cmd(self, args):
+        """
+        Hits, misses, hit rate, evictions and size of the
+        check_block_win cache
+        """
+        cache = BLOCK_WIN_CACHE
+        self.respond("hits {} misses {} hit_rate {:.3f} evictions {} "
+                     "size {}/{}".format(cache.hits, cache.misses,
+                                         cache.hit_rate(), cache.evictions,
+                                         len(cache), cache.maxsize))
+
+    def solver_cmd(self, args):
+        """
+        Set the forced win search of genmove: off, vcf (continuous
+        fours) or vct (continuous fours and threes)
+        """
+        if args[0] not in SOLVERS:
+            self.error(self.argmap["solver"][1])
+            return
+        self.solver = args[0]
+        self.respond("solver set to " + self.solver)
+
+    def solver_limits_cmd(self, args):
+        """
+        Limit the forced win search to args[0] nodes and args[1] seconds
+        """
+        try:
+            max_nodes = int(args[0])
+            time_limit = float(args[1])
+        except ValueError:
+            max_nodes = 0
+            time_limit = 0
+        if max_nodes <= 0 or time_limit <= 0:
+            self.error(self.argmap["solver_limits"][1])
+            return
+        self.threat_solver.max_nodes = max_nodes
+        self.threat_solver.time_limit = time_limit
+        self.respond("solver limits set to {} nodes, {} seconds"
+                     .format(max_nodes, time_limit))
+
+    def alphabeta_depth_cmd(self, args):
+        """
+        Search at most args[0] plies deep with the alphabeta policy
+        """
+        try:
+            depth = int(args[0])
+        except ValueError:
+            depth = 0
+        if depth <= 0:
+            self.error(self.argmap["alphabeta_depth"][1])
+            return
+        self.alphabeta.max_depth = depth
+        self.respond("alphabeta_depth set to {}".format(depth))
+
+    def alphabeta_stats_cmd(self, args):
+        """
+        Depth reached, nodes, transposition table cutoffs, nodes per
+        second and score of the last alpha-beta search
+        """
+        search = self.alphabeta
+        self.respond("depth {} nodes {} tt_cutoffs {} nps {:.0f} score {}"
+                     .format(search.depth, search.nodes, search.tt_cutoffs,
+                             search.nps, search.score))
+
+    def candidate_radius_cmd(self, args):
+        """
+        Only consider moves at most args[0] rows and columns away
+        from a stone
+        """
+        try:
+            radius = int(args[0])
+        except ValueError:
+            radius = 0
+        if radius <= 0:
+            self.error(self.argmap["candidate_radius"][1])
+            return
+        self.board.set_candidate_radius(radius)
+        # the tree was expanded with the old candidates
+        self.mcts.root = None
+        self.respond("candidate_radius set to {}".format(radius))
+
+    def playout_cost_cmd(self, args):
+        """
+        Time args[1] playouts of the random or rule_based simulation
+        from the current position, with the player to move starting
+        """
+        playouts = {"random": random_simulation,
+                    "rule_based": rules_simulation}
+        try:
+            num_playouts = int(args[1])
+        except ValueError:
+            num_playouts = 0
+        if args[0] not in playouts or num_playouts <= 0:
+            self.error(self.argmap["playout_cost"][1])
+            return
+        playout = playouts[args[0]]
+        color = self.board.current_player
+        start = time.time()
+        for _ in range(num_playouts):
+            playout(self.board, color, color)
+        elapsed = time.time() - start
+        self.respond("playouts {} seconds {:.3f} ms_per_playout {:.3f} "
+                     "playouts_per_second {:.0f}"
+                     .format(num_playouts, elapsed,
+                             1000 * elapsed / num_playouts,
+                             num_playouts / elapsed if elapsed > 0 else 0))
+
+    def stop_cmd(self, args):
+        """
+        Make a running genmove play the best move found so far.
+        For a genmove still waiting, see start_connection.
+        """
+        if self._searching:
+            self._search_stop.set()
+        self.respond()
+
+    def ponder_cmd(self, args):
+        """
+        Turn pondering after genmove on or off
+        """
+        if args[0] not in ("on", "off"):
+            self.error(self.argmap["ponder"][1])
+            return
+        self.ponder = args[0] == "on"
+        self.respond("ponder set to " + args[0])
 
     def policy_moves(self,args):
         movetype, moves = check_block_win(self.board)
@@ -425,6 +1271,16 @@ class GtpConnection():
 
 
 
+def command_name(line):
+    """
+    Name of the GTP command in line, without a leading command number,
+    or None if there is none
+    """
+    elements = re.sub(r"^\d+", "", line.strip()).split()
+    if not elements or elements[0].startswith('#'):
+        return None
+    return elements[0]
+
 def point_to_coord(point, boardsize):
     """
     Transform point given as board array index 
@@ -497,150 +1353,203 @@ def check_wins(board):
 #Check Block Win
 ################################################################################
 def check_block_win(board, color=None):
-
+    """
+    Classify the moves of color (default: the player to move) as
+    Win, BlockWin, OpenFour, BlockOpenFour or Random, and return the
+    first class which has moves with its list of moves.
+    The moves are sorted, so the result does not depend on the order
+    in which the position was reached.
+    Results are cached per position in BLOCK_WIN_CACHE, and the
+    returned list is a new list which the caller may change.
+    For Random only the class is cached, the moves are all legal moves.
+    """
     if color == None:
         color = board.current_player
-    original_board = board.copy()
+    key = (board.size, board.zobrist_key, color)
+    result = BLOCK_WIN_CACHE.get(key)
+    if result is None:
+        movetype, moves = classify_moves(board, color)
+        if movetype == "Random":
+            result = (movetype, None)
+        else:
+            result = (movetype, tuple(moves))
+        BLOCK_WIN_CACHE.put(key, result)
+        return movetype, moves
+    movetype, moves = result
+    if moves is None:
+        return movetype, sorted(GoBoardUtil.generate_legal_moves_gomoku(board))
+    return movetype, list(moves)
+
+def classify_moves(board, color):
+    """
+    Uncached check_block_win. Each move is classified by
+    local_patterns from the four lines through it.
+    The moves are returned sorted.
+    """
     moves = GoBoardUtil.generate_legal_moves_gomoku(board)
-    
-    win_moves = list()
-    block_win_moves = list()
-    open_four_moves = list()
-    block_open_four_moves = list()
-
-    returned_move_list = list()
-
-    # initially set all switches to false
-    found_win = False
-    found_block_win = False
-    found_open_four = False
-    found_block_open_four = False
-
-    # check to see how many situations exist beforehand
-    original_block_situations = original_board.check_block_win_gomoku(color)
-    original_open_situations = original_board.check_open_four_gomoku(color)
-    original_block_open_situations = original_board.check_block_open_four_gomoku(color)
-        
-    for move in moves:
-
-        board_copy = board.copy()
-        #STACK.append(board_copy.copy())
-        save(board)
-        board_copy.play_move_gomoku(move, color)
-
-        # If win, update win
-        game_end, winner = board_copy.check_game_end_gomoku()
-        if (game_end):
-            win_moves.append(move)
-            found_win = True
-        
-        # If blockwin, update blockwin
-        if (not found_win):
-            check_block_situations = board_copy.check_block_win_gomoku(color)
-            if(check_block_situations < original_block_situations):
-                block_win_moves.append(move)
-                found_block_win = True
-
-        #open four
-        if (not found_win and not found_block_win):
-            check_open_situations = board_copy.check_open_four_gomoku(color)
-            if(check_open_situations > original_open_situations):
-                open_four_moves.append(move)
-                found_open_four = True
-            
-
-        #block open four
-        if (not found_win and not found_block_win and not found_open_four):
-            check_block_open_situations = board_copy.check_block_open_four_gomoku(color)
-            if (check_block_open_situations < original_block_open_situations):
-                block_open_four_moves.append(move)
-                found_block_open_four = True
-
-        board = undo()
+    # Every move which changes one of the pattern counts is at most
+    # PATTERN_RADIUS points away from a stone along a line, so with
+    # a large enough candidate radius only the candidates are tried.
+    # After a five every move is a win.
+    pattern_moves = moves
+    if board.candidate_radius >= PATTERN_RADIUS and board.winner is None:
+        pattern_moves = board.candidate_point_list()
+    movetype, found = local_patterns.classify_moves(board, color,
+                                                    pattern_moves)
+    if movetype is None:
+        return "Random", sorted(moves)
+    return movetype, sorted(found)
+
+
+def likely_replies(board, color):
+    """
+    Candidate moves of color, starting with the moves of the first
+    class found by check_block_win
+    """
+    movetype, urgent = check_block_win(board, color)
+    moves = sorted(GoBoardUtil.generate_candidate_moves_gomoku(board))
+    if movetype == "Random":
+        return moves
+    urgent.sort()
+    return urgent + [move for move in moves if move not in urgent]
 
-    
-    if (found_win):
-        returnstring = "Win"
-        returned_move_list = win_moves
 
-    elif (found_block_win):
-        returnstring = "BlockWin"
-        returned_move_list = block_win_moves
-        
-    elif (found_open_four):
-        returnstring = "OpenFour"
-        returned_move_list = open_four_moves
+class SimulationTimeout(Exception):
+    """
+    Raised by a playout which runs past its deadline
+    """
 
-    elif (found_block_open_four):
-        returnstring = "BlockOpenFour"
-        returned_move_list = block_open_four_moves
-
-    else:
-        returnstring = "Random"
-        returned_move_list = moves
-            
-    return returnstring, returned_move_list
 
+# Number of random playouts per round of evaluate_moves with a deadline,
+# over all moves together. Small enough to stop close to the deadline.
+# With only a stop event, a round is one full batch of MAX_BATCH games.
+ROUND_GAMES = 512
 
-def save(board):
-    STACK.append(board.copy())
+def time_up(deadline, stop):
+    """
+    Whether the deadline passed or the threading.Event stop is set.
+    Both may be None.
+    """
+    if stop is not None and stop.is_set():
+        return True
+    return deadline is not None and time.time() >= deadline
 
-def undo():
-    return STACK.pop()
 
+def evaluate_moves(board, color, moves, policy, num_simulations,
+                   seed = None, deadline = None, stop = None, rng = None):
+    """
+    Run playouts of the given policy after each move for color.
+    Returns [wins, simulations] for each move, counting draws as half a win.
+    Without a deadline, num_simulations playouts are run per move.
+    With a deadline (a time.time() value), playouts are run in rounds
+    over all moves until the deadline or until num_simulations is
+    reached. num_simulations may then be None for no limit.
+    Setting the event stop ends the playouts like the deadline. The
+    random policy then runs its playouts in rounds as well.
+    If seed is given, the playouts of each move are seeded with seed,
+    the move and the round, so they do not depend on the other moves.
+    The rule based playouts draw from the random.Random rng, a new one
+    by default.
+    board is unchanged on return.
+    """
+    if rng is None:
+        rng = random.Random()
+    stats = [[0.0, 0] for move in moves]
+    if not moves:
+        return stats
+    opp_color = GoBoardUtil.opponent(color)
+    done = 0
+    while num_simulations is None or done < num_simulations:
+        if stop is not None and stop.is_set():
+            break
+        if policy == "random":
+            # one batch of the engine per round
+            if deadline is None and stop is None:
+                n = num_simulations
+            else:
+                round_games = ROUND_GAMES if deadline is not None \
+                              else MAX_BATCH
+                n = max(1, round_games // len(moves))
+                if num_simulations is not None:
+                    n = min(n, num_simulations - done)
+            seeds = None
+            if seed is not None:
+                seeds = [[seed, move, done] for move in moves]
+            outcome = simulate_moves(board, color, moves, n, seeds = seeds)
+            for k in range(len(moves)):
+                stats[k][0] += float(outcome[k, 0] + 0.5 * outcome[k, 1])
+                stats[k][1] += n
+        else:
+            n = 1
+            for k, move in enumerate(moves):
+                if time_up(deadline, stop):
+                    return stats
+                if seed is not None:
+                    rng.seed("{} {} {}".format(seed, move, done))
+                move_nr = board.move_number()
+                board.play_move_gomoku(move, color)
+                try:
+                    stats[k][0] += rules_simulation(board, color, opp_color,
+                                                    deadline, stop, rng)
+                except SimulationTimeout:
+                    # drop the unfinished playout
+                    board.reset_to_move_number(move_nr)
+                    return stats
+                board.undo_move()
+                stats[k][1] += 1
+        done += n
+        if time_up(deadline, stop):
+            break
+    return stats
 
 
 def random_simulation(board, original_color, color):
-
-    #check base case
-    game_end, winner = board.check_game_end_gomoku()
-    if game_end:
-        if winner == original_color:
-            return True
-    move = GoBoardUtil.generate_random_move_gomoku(board)
-    if move == PASS:
-        return False
-    
-    #save to stack
-    STACK.append(board.copy())
-    
-    #play move
-    board.play_move_gomoku(move, color)
-    status = random_simulation(board.copy(), original_color, GoBoardUtil.opponent(color))
-
-    #pop from stack
-    board = STACK.pop()
-
-    return status
-
-
-def rules_simulation(board, original_color, color):
-
-    #check base case
-    game_end, winner = board.check_game_end_gomoku()
-    if game_end:
-        if winner == original_color:
-            return 1
-        else:
-            return 0
-    #if board is empty, return Loss
-    string, moves = check_block_win(board.copy(), color)
-    if len(moves) == 0:
-        return 0.5
-
-    move = moves.pop()
-    
-    if move == PASS:
+    """
+    Play random moves on board, starting with color, until the game ends.
+    The moves are taken back again, so board is unchanged on return.
+    Returns whether original_color won.
+    """
+    move_nr = board.move_number()
+    while board.winner is None:
+        move = GoBoardUtil.generate_random_move_gomoku(board)
+        if move == PASS:
+            break
+        board.play_move_gomoku(move, color)
+        color = GoBoardUtil.opponent(color)
+    won = board.winner == original_color
+    board.reset_to_move_number(move_nr)
+    return won
+
+
+def rules_simulation(board, original_color, color, deadline = None,
+                     stop = None, rng = None):
+    """
+    Play rule based moves on board, starting with color, until the
+    game ends. Each move is chosen at random among the moves of the
+    first class found by check_block_win.
+    The moves are taken back again, so board is unchanged on return.
+    The moves are drawn from the random.Random rng, or from the random
+    module by default.
+    Returns 1 for a win of original_color, 0.5 for a draw and 0 for a loss.
+    Raises SimulationTimeout when the deadline passes or the
+    threading.Event stop is set during the playout,
+    with the moves played so far still on the board.
+    """
+    if rng is None:
+        rng = random
+    move_nr = board.move_number()
+    while board.winner is None:
+        if time_up(deadline, stop):
+            raise SimulationTimeout()
+        _, moves = check_block_win(board, color)
+        if not moves:
+            break
+        board.play_move_gomoku(rng.choice(moves), color)
+        color = GoBoardUtil.opponent(color)
+    winner = board.winner
+    board.reset_to_move_number(move_nr)
+    if winner is None:
         return 0.5
-    
-    #save to stack
-    #STACK1.append(board.copy())
-    
-    #play move
-    board.play_move_gomoku(move, color)
-    status = rules_simulation(board, original_color, GoBoardUtil.opponent(color))
-
-    #pop from stack
-    #board = STACK1.pop()
-
-    return status
+    if winner == original_color:
+        return 1
+    return 0
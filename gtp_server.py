@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+"""
+gtp_server.py
+
+Serves many GTP games from one process, over TCP or a Unix socket.
+
+Every client connection is a separate game with its own SimpleGoBoard
+and GtpConnection, so its board, policy, search trees and settings
+are not shared with other games. Commands are read one line at a time
+and run in a thread pool of a fixed size, so a long genmove of one game
+does not hold up the others. Only max_pending commands may be running
+or waiting for a thread at any time. When they are all taken, the
+server stops reading from its connections until one is done, and the
+clients are slowed down by their full socket buffers.
+
+The check_block_win cache is shared by all games of the process.
+Each game draws its simulations from its own random.Random, so a
+seeded game plays the same moves as it would in its own process.
+
+Pondering runs outside the thread pool, so it is limited separately:
+at most ponder_threads games ponder at once, none by default.
+
+Start one server per core, for example:
+    python3 gtp_server.py --port 5000 --threads 4
+"""
+
+import argparse
+import asyncio
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+from Gomoku import Gomoku
+
+DEFAULT_BOARD_SIZE = 7
+# Threads running GTP commands
+DEFAULT_THREADS = 4
+# Commands running or waiting for a thread, over all connections
+DEFAULT_MAX_PENDING = 64
+# Games pondering at the same time
+DEFAULT_PONDER_THREADS = 0
+
+class GtpSession(object):
+    """
+    One game: a GtpConnection whose responses are collected in a buffer
+    """
+    def __init__(self, board_size = DEFAULT_BOARD_SIZE, debug_mode = False,
+                 ponder_slots = None):
+        self.output = io.StringIO()
+        self.connection = GtpConnection(Gomoku(), SimpleGoBoard(board_size),
+                                        debug_mode = debug_mode,
+                                        outfile = self.output)
+        self.connection.ponder_slots = ponder_slots
+        self.closed = False
+
+    def execute(self, line):
+        """
+        Run the GTP command in line and return its response,
+        an empty string for comments and empty lines.
+        After quit, closed is set.
+        """
+        try:
+            self.connection.get_cmd(line)
+        except SystemExit:
+            self.closed = True
+        except Exception as e:
+            self.connection.error("Error executing command {}".format(e))
+        response = self.output.getvalue()
+        self.output.seek(0)
+        self.output.truncate()
+        return response
+
+    def close(self):
+        self.connection.stop_ponder()
+        self.connection.close_pool()
+
+class GtpServer(object):
+    """
+    asyncio server of GtpSessions
+    """
+    def __init__(self, board_size = DEFAULT_BOARD_SIZE,
+                 threads = DEFAULT_THREADS,
+                 max_pending = DEFAULT_MAX_PENDING, debug_mode = False,
+                 ponder_threads = DEFAULT_PONDER_THREADS):
+        assert threads >= 1 and max_pending >= 1 and ponder_threads >= 0
+        self.board_size = board_size
+        self.debug_mode = debug_mode
+        self.executor = ThreadPoolExecutor(threads)
+        self.max_pending = max_pending
+        self.pending = None
+        self.ponder_slots = threading.Semaphore(ponder_threads)
+        self.num_sessions = 0
+
+    async def handle(self, reader, writer):
+        """
+        Serve one connection until the client closes it or sends quit
+        """
+        loop = asyncio.get_running_loop()
+        session = GtpSession(self.board_size, self.debug_mode,
+                             self.ponder_slots)
+        self.num_sessions += 1
+        try:
+            while not session.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                # no more reading while max_pending commands are pending
+                async with self.pending:
+                    response = await loop.run_in_executor(
+                        self.executor, session.execute,
+                        line.decode("utf-8", "replace"))
+                if response:
+                    writer.write(response.encode())
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.num_sessions -= 1
+            await loop.run_in_executor(self.executor, session.close)
+            writer.close()
+
+    async def serve(self, host = None, port = None, path = None):
+        """
+        Serve on the Unix socket path if it is given,
+        otherwise on TCP host and port, until cancelled
+        """
+        self.pending = asyncio.Semaphore(self.max_pending)
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = "Serve GTP Gomoku games over TCP or a Unix socket")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 5000)
+    parser.add_argument("--unix", metavar = "PATH",
+                        help = "serve on a Unix socket instead of TCP")
+    parser.add_argument("--size", type = int, default = DEFAULT_BOARD_SIZE,
+                        help = "board size of new games")
+    parser.add_argument("--threads", type = int, default = DEFAULT_THREADS)
+    parser.add_argument("--max-pending", type = int,
+                        default = DEFAULT_MAX_PENDING)
+    parser.add_argument("--ponder-threads", type = int,
+                        default = DEFAULT_PONDER_THREADS,
+                        help = "most games pondering at the same time")
+    parser.add_argument("--debug", action = "store_true")
+    args = parser.parse_args()
+    server = GtpServer(args.size, args.threads, args.max_pending, args.debug,
+                       args.ponder_threads)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__=='__main__':
+    run()
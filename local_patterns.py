@@ -0,0 +1,128 @@
+"""
+local_patterns.py
+
+Local version of the move classification of check_block_win.
+
+check_block_win compares three counts before and after each move:
+the opponent stones passing point_check_block_win_gomoku, the stones
+of color passing point_check_open_four_gomoku and the opponent stones
+passing point_check_block_open_four_gomoku. A stone passes a check if
+one of its four direction walks does. A move can only change the walks
+which reach it, and these lie on the four lines through the move and
+read at most four points. Unless the board already has a five, a
+block win walk which gets further has counted four stones and passes
+whatever it finds next.
+
+So the change of each count is found from the stones at most
+LINE_REACH points away from the move along its lines. For each such
+stone, only the walk along the line through the move is redone with
+the move on the board. The other three walks of a stone do not change,
+and are computed once per classification.
+"""
+
+from board_util import GoBoardUtil, EMPTY, BORDER
+
+# Points looked at in each direction from a move
+LINE_REACH = 5
+
+class LocalPatterns(object):
+    """
+    Pattern count changes of the moves of color on board.
+    The board must not change while it is in use, except for the
+    moves played and taken back by its own methods.
+    """
+    def __init__(self, board, color):
+        self.board = board
+        self.color = color
+        self.opp_color = GoBoardUtil.opponent(color)
+        # per stone, the direction flags of the checks for its color
+        self.flags = {}
+        self.checks = {
+            color: (board._point_direction_check_open,),
+            self.opp_color: (board._point_direction_check_block_win,
+                             board._point_direction_check_block_open)
+        }
+
+    def _stone_flags(self, stone):
+        """
+        For each check of the color of stone, the list of its results
+        in the directions board.shifts
+        """
+        flags = self.flags.get(stone)
+        if flags is None:
+            flags = [[check(stone, shift) for shift in self.board.shifts]
+                     for check in self.checks[self.board.board[stone]]]
+            self.flags[stone] = flags
+        return flags
+
+    def _line_stones(self, move):
+        """
+        (stone, direction index) of the stones at most LINE_REACH
+        points away from move along its four lines
+        """
+        board = self.board.board
+        stones = []
+        for d, shift in enumerate(self.board.shifts):
+            for step in (shift, -shift):
+                p = move
+                for _ in range(LINE_REACH):
+                    p += step
+                    if board[p] == BORDER:
+                        break
+                    if board[p] != EMPTY:
+                        stones.append((p, d))
+        return stones
+
+    def deltas(self, move):
+        """
+        Changes of the block win, open four and block open four counts
+        of check_block_win when color plays move
+        """
+        board = self.board
+        stones = self._line_stones(move)
+        before = [self._stone_flags(stone) for stone, _ in stones]
+        board.play_move_gomoku(move, self.color)
+        changes = [0, 0, 0]
+        for (stone, d), flags in zip(stones, before):
+            shift = board.shifts[d]
+            if board.board[stone] == self.color:
+                indices = (1,)
+            else:
+                indices = (0, 2)
+            for i, check, dir_flags in zip(indices,
+                                           self.checks[board.board[stone]],
+                                           flags):
+                new_flag = check(stone, shift)
+                if new_flag == dir_flags[d]:
+                    continue
+                others = any(dir_flags[k] for k in range(4) if k != d)
+                if not others:
+                    changes[i] += 1 if new_flag else -1
+        if board.point_check_open_four_gomoku(move):
+            changes[1] += 1
+        board.undo_move()
+        return changes
+
+def classify_moves(board, color, moves):
+    """
+    Same result as the whole-board classification of check_block_win
+    for the given moves: the first of Win, BlockWin, OpenFour and
+    BlockOpenFour with moves and its list of moves, or None, [] if
+    no move is in any of them.
+    """
+    if board.winner is not None:
+        return "Win", list(moves)
+    fives = set(board.winning_points(color))
+    win_moves = [move for move in moves if move in fives]
+    if win_moves:
+        return "Win", win_moves
+    patterns = LocalPatterns(board, color)
+    changes = [patterns.deltas(move) for move in moves]
+    # the counts that must go down, up and down
+    for name, i, sign in [("BlockWin", 0, -1), ("OpenFour", 1, 1),
+                          ("BlockOpenFour", 2, -1)]:
+        found = [move for move, delta in zip(moves, changes)
+                 if delta[i] * sign > 0]
+        if found:
+            return name, found
+    return None, []
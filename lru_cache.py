@@ -0,0 +1,80 @@
+"""
+lru_cache.py
+
+A dictionary with a maximum number of entries, which evicts the
+least recently used entry when it is full, and counts its hits,
+misses and evictions. It may be shared by threads: every operation
+holds a lock.
+"""
+
+import threading
+from collections import OrderedDict
+
+class LRUCache(object):
+    """
+    Least recently used cache. A maxsize of 0 stores nothing.
+    """
+    def __init__(self, maxsize):
+        assert maxsize >= 0
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Return the value stored for key, or None
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store value for key, evicting the least recently used entry
+        if the cache is full. value must not be None.
+        """
+        assert value is not None
+        with self.lock:
+            if self.maxsize == 0:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last = False)
+                self.evictions += 1
+
+    def resize(self, maxsize):
+        """
+        Change the maximum size, evicting entries if needed
+        """
+        assert maxsize >= 0
+        with self.lock:
+            self.maxsize = maxsize
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last = False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.reset_stats()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
@@ -0,0 +1,254 @@
+"""
+mcts.py
+
+Monte Carlo Tree Search for Gomoku, with UCT selection.
+
+The tree is rooted at the current position of a SimpleGoBoard.
+Each search iteration plays the moves of the selected path on the board,
+adds one new node, runs a playout and takes all moves back again.
+After a move is played, update_with_move makes the subtree below that
+move the new root, so the search work for it is kept for the next move.
+
+With a transposition table, every new node starts with the wins and
+visits stored for its position, and the nodes are stored back after
+each search, so positions reached by another move order are not
+searched from scratch.
+"""
+
+import math
+import random
+import time
+from board_util import GoBoardUtil, PASS
+from root_selection import MoveStats
+from transposition import position_key, visits_depth
+
+# Exploration constant of UCT
+EXPLORATION = math.sqrt(2)
+# Nodes with fewer visits are not stored in the transposition table
+MIN_STORE_VISITS = 2
+
+def random_playout(board, original_color, color, deadline = None,
+                   rng = None):
+    """
+    Play random moves on board, starting with color, until the game ends.
+    The moves are drawn from the random.Random rng, or from the random
+    module by default. The moves are left on the board.
+    Returns 1 for a win of original_color, 0.5 for a draw and 0 for a loss.
+    """
+    while board.winner is None:
+        move = board.random_empty_point(rng)
+        if move == PASS:
+            return 0.5
+        board.play_move_gomoku(move, color)
+        color = GoBoardUtil.opponent(color)
+    if board.winner == original_color:
+        return 1
+    return 0
+
+class TreeNode(object):
+    """
+    A node of the search tree. wins and visits are counted for color,
+    the player who played move to reach the node.
+    key is the transposition table key of the node position.
+    """
+    def __init__(self, parent, move, color, key = 0):
+        self.parent = parent
+        self.move = move
+        self.color = color
+        self.key = key
+        self.children = {}
+        # moves not expanded yet, None until the node is first expanded
+        self.untried = None
+        self.wins = 0.0
+        self.visits = 0
+
+    def uct_child(self, exploration):
+        log_visits = math.log(self.visits)
+        def value(child):
+            return child.wins / child.visits + \
+                   exploration * math.sqrt(log_visits / child.visits)
+        return max(self.children.values(), key = value)
+
+class MCTS(object):
+    """
+    UCT search with subtree reuse.
+
+    playout is called as
+    playout(board, original_color, color, deadline, rng = rng)
+    with color to play on board and must return the result for
+    original_color: 1, 0.5 or 0. It may leave its moves on the board
+    and may raise an exception at the deadline, which stops the search.
+
+    tt is an optional transposition.TranspositionTable, and salt
+    keeps the entries of this search apart from other searches in it.
+    rng is the random.Random of the search, a new one by default.
+    """
+    def __init__(self, playout = random_playout, exploration = EXPLORATION,
+                 tt = None, salt = 0, rng = None):
+        self.playout = playout
+        self.rng = random.Random() if rng is None else rng
+        self.exploration = exploration
+        self.tt = tt
+        self.salt = salt
+        self.root = None
+        # (point, color) moves leading to the root position
+        self.root_history = None
+
+    @staticmethod
+    def _history(board):
+        return [(point, color) for point, color, _ in board.moves]
+
+    def _set_root(self, board, color):
+        """
+        Keep the tree if it is rooted at the board position with color
+        to play, otherwise start a new tree there.
+        """
+        history = self._history(board)
+        if self.root is None or history != self.root_history or \
+           self.root.color != GoBoardUtil.opponent(color):
+            self.root = TreeNode(None, None, GoBoardUtil.opponent(color),
+                                 position_key(board, color, self.salt))
+            self.root_history = history
+
+    def update_with_move(self, move, color):
+        """
+        Move the root to the child for move of color, keeping its subtree.
+        """
+        if self.root is None:
+            return
+        child = self.root.children.get(move)
+        if child is None or child.color != color:
+            self.root = None
+            return
+        child.parent = None
+        self.root = child
+        self.root_history.append((move, color))
+
+    def search(self, board, color, max_playouts = None, deadline = None,
+               stop = None):
+        """
+        Search from the board position with color to play,
+        for max_playouts iterations, until the deadline or until the
+        threading.Event stop is set.
+        At least one of them must be given. board is unchanged on return.
+        Returns the most visited move, or PASS if there is none.
+        """
+        assert max_playouts is not None or deadline is not None or \
+               stop is not None
+        self._set_root(board, color)
+        start_nr = board.move_number()
+        playouts = 0
+        while max_playouts is None or playouts < max_playouts:
+            if deadline is not None and time.time() >= deadline:
+                break
+            if stop is not None and stop.is_set():
+                break
+            try:
+                self._iteration(board, color, deadline)
+            except Exception:
+                board.reset_to_move_number(start_nr)
+                if deadline is not None and time.time() >= deadline:
+                    break
+                raise
+            board.reset_to_move_number(start_nr)
+            playouts += 1
+        if self.tt is not None:
+            self._store_tree()
+        if not self.root.children:
+            return PASS
+        best = max(self.root.children.values(),
+                   key = lambda child: child.visits)
+        return best.move
+
+    def _iteration(self, board, color, deadline):
+        # selection: descend through fully expanded nodes
+        node = self.root
+        to_play = color
+        while node.untried == [] and node.children:
+            node = node.uct_child(self.exploration)
+            board.play_move_gomoku(node.move, node.color)
+            to_play = GoBoardUtil.opponent(node.color)
+
+        # expansion
+        if board.winner is None:
+            if node.untried is None:
+                node.untried = \
+                    GoBoardUtil.generate_candidate_moves_gomoku(board)
+                self.rng.shuffle(node.untried)
+            if node.untried:
+                move = node.untried.pop()
+                board.play_move_gomoku(move, to_play)
+                opp_color = GoBoardUtil.opponent(to_play)
+                child = TreeNode(node, move, to_play,
+                                 position_key(board, opp_color, self.salt))
+                to_play = opp_color
+                node.children[move] = child
+                node = child
+                self._load(child)
+
+        # simulation
+        if board.winner is not None:
+            result = 1 if board.winner == color else 0
+        else:
+            result = self.playout(board, color, to_play, deadline,
+                                  rng = self.rng)
+
+        # backpropagation. Nodes are also stored whenever their visits
+        # reach a power of two, so that transpositions inside the
+        # current search can use them.
+        while node is not None:
+            node.visits += 1
+            node.wins += result if node.color == color else 1 - result
+            if self.tt is not None and node.visits >= MIN_STORE_VISITS \
+               and node.visits & (node.visits - 1) == 0:
+                self._store(node)
+            node = node.parent
+
+    def _load(self, node):
+        """
+        Start node with the wins and visits stored for its position
+        """
+        if self.tt is None:
+            return
+        entry = self.tt.probe(node.key)
+        if entry is not None:
+            value, visits, _, _ = entry
+            node.wins = value * visits
+            node.visits = visits
+
+    def _store_tree(self):
+        """
+        Store the win rate, visits and most visited move of all nodes
+        with at least MIN_STORE_VISITS visits
+        """
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.visits < MIN_STORE_VISITS:
+                continue
+            self._store(node)
+            stack.extend(node.children.values())
+
+    def _store(self, node):
+        best_move = 0
+        if node.children:
+            best = max(node.children.values(),
+                       key = lambda child: child.visits)
+            best_move = best.move
+        self.tt.store(node.key, node.wins / node.visits, node.visits,
+                      best_move, visits_depth(node.visits))
+
+    def root_move_stats(self, moves):
+        """
+        root_selection.MoveStats of the root children for the given moves
+        """
+        stats = MoveStats(len(moves))
+        results = []
+        for move in moves:
+            child = self.root.children.get(move) if self.root else None
+            if child is None:
+                results.append((0.0, 0))
+            else:
+                results.append((child.wins, child.visits))
+        stats.add(range(len(moves)), results)
+        return stats
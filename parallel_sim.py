@@ -0,0 +1,98 @@
+"""
+parallel_sim.py
+
+A process pool which splits the candidate moves of genmove over
+several worker processes.
+
+Each worker gets the position once per genmove, as the compact board
+state of board_state: the board size and the list of moves played.
+It rebuilds the board, scores its share of the candidate moves with
+the given evaluation function, and the scores are merged in move order.
+When the evaluation function seeds its random numbers per move,
+the result does not depend on the number of workers.
+
+The workers are started with the "spawn" method. A forked worker would
+copy the locks of the parent, such as the one of standard input which
+the GTP reader thread holds while it waits for a line, and could hang
+on them.
+"""
+
+import multiprocessing
+from simple_board import SimpleGoBoard
+
+# Seconds between the checks of the stop event while the workers run
+STOP_POLL = 0.01
+
+# Event of the pool which stops the evaluation in a worker process
+_worker_stop = None
+
+def board_state(board):
+    """
+    Compact state of a board: its size, the (point, color) moves played
+    since the last reset, and the player to move.
+    """
+    moves = [(point, color) for point, color, _ in board.moves]
+    return board.size, moves, board.current_player
+
+def board_from_state(state):
+    """
+    Rebuild a SimpleGoBoard from the result of board_state
+    """
+    size, moves, current_player = state
+    board = SimpleGoBoard(size)
+    for point, color in moves:
+        board.play_move_gomoku(point, color)
+    board.current_player = current_player
+    return board
+
+def _init_worker(stop):
+    global _worker_stop
+    _worker_stop = stop
+
+def _evaluate_chunk(args):
+    evaluate, state, color, moves, options = args
+    board = board_from_state(state)
+    return evaluate(board, color, moves, stop = _worker_stop, **options)
+
+class SimulationPool(object):
+    """
+    Pool of worker processes for evaluating candidate moves
+    """
+    def __init__(self, num_workers):
+        assert num_workers >= 1
+        self.num_workers = num_workers
+        context = multiprocessing.get_context("spawn")
+        self.stop = context.Event()
+        self.pool = context.Pool(num_workers, initializer = _init_worker,
+                                 initargs = (self.stop,))
+
+    def evaluate(self, evaluate, board, color, moves, stop = None,
+                 **options):
+        """
+        Return evaluate(board, color, moves, stop = ..., **options),
+        computed by splitting moves into one contiguous chunk per worker.
+        evaluate must return a list with one score per move and be
+        a module level function, so that it can be sent to the workers.
+        It gets an event of the pool as stop, which is set when the
+        threading.Event stop is, checked every STOP_POLL seconds.
+        """
+        if not moves:
+            return []
+        state = board_state(board)
+        chunk_size = -(-len(moves) // self.num_workers)
+        tasks = [(evaluate, state, color, moves[i : i + chunk_size], options)
+                 for i in range(0, len(moves), chunk_size)]
+        self.stop.clear()
+        result = self.pool.map_async(_evaluate_chunk, tasks)
+        while not result.ready():
+            if stop is not None and stop.is_set():
+                self.stop.set()
+            result.wait(STOP_POLL)
+        scores = []
+        for chunk_scores in result.get():
+            scores.extend(chunk_scores)
+        return scores
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,327 @@
+#!/usr/bin/python3
+"""
+regress.py
+
+Runs GTP regression scripts in-process, without an external tool.
+
+Every line of a script is passed to GtpConnection.get_cmd of a new
+connection, and timed. A numbered command such as
+    10 policy_moves
+followed by an expectation line
+    #?[BlockWin D4]
+is a test. Like in GoGui regression files, the text in brackets is a
+regular expression which must match the whole response, without its
+leading '=' and command number. A pattern starting with '?' expects the command to fail,
+a pattern starting with '!' must not match, and a trailing '*' marks
+a known failure.
+
+Several scripts are run in parallel processes with --jobs, for example:
+    python3 regress.py --jobs 3 *.gtp blockwin_test.py
+With --engine, each script is written at once to the standard input
+of an engine process instead, and the responses are matched to the
+commands by their numbers. This tests the command reader, which answers
+some commands while genmove is searching, and batch mode:
+    python3 regress.py --engine "python3 Gomoku.py" instant_commands_test.gtp
+    python3 regress.py --engine "python3 Gomoku.py --batch" *.gtp
+The exit status is 1 if a test failed unexpectedly.
+"""
+
+import argparse
+import io
+import re
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from gtp_connection import GtpConnection, command_name
+from simple_board import SimpleGoBoard
+from Gomoku import Gomoku
+
+DEFAULT_BOARD_SIZE = 7
+# Percentiles of the command times in the summary
+PERCENTILES = [50, 90, 99]
+# Number of slowest commands listed
+NUM_SLOWEST = 5
+# Seconds an engine process may take for a script
+DEFAULT_ENGINE_TIMEOUT = 120
+
+EXPECTATION = re.compile(r"^#\?\s*\[(.*)\](\*?)\s*$")
+NUMBERED = re.compile(r"^\s*(\d+)\s")
+RESPONSE = re.compile(r"^([=?])(\d*)(.*)$", re.DOTALL)
+
+class TestResult(object):
+    """
+    Outcome of one numbered command with an expectation
+    """
+    def __init__(self, line_nr, number, command, pattern, response,
+                 passed, expected_fail):
+        self.line_nr = line_nr
+        self.number = number
+        self.command = command
+        self.pattern = pattern
+        self.response = response
+        self.passed = passed
+        self.expected_fail = expected_fail
+
+    def unexpected(self):
+        return self.passed == self.expected_fail
+
+    def describe(self, path):
+        if self.passed:
+            status = "PASS" if not self.expected_fail else "UNEXPECTED PASS"
+        else:
+            status = "FAIL" if not self.expected_fail else "fail"
+        return "{}:{}: {} {}: expected [{}], got [{}]".format(
+            path, self.line_nr, status, self.command, self.pattern,
+            self.response)
+
+def parse_response(output):
+    """
+    (failed, text) of the GTP response in output,
+    or None if there is none
+    """
+    m = RESPONSE.match(output)
+    if not m:
+        return None
+    return m.group(1) == '?', m.group(3).strip()
+
+def engine_responses(output):
+    """
+    Dictionary from command number to (failed, text) of the numbered
+    responses in the output of an engine
+    """
+    responses = {}
+    for block in output.split("\n\n"):
+        m = RESPONSE.match(block.strip("\n"))
+        if m and m.group(2):
+            responses[m.group(2)] = parse_response(block.strip("\n"))
+    return responses
+
+def matches(pattern, failed, text):
+    """
+    GoGui rules for the expected pattern of a response
+    """
+    negate = pattern.startswith('!')
+    if negate:
+        pattern = pattern[1:]
+    expect_failure = pattern.startswith('?')
+    if expect_failure:
+        pattern = pattern[1:]
+    try:
+        found = re.fullmatch(pattern, text, re.DOTALL) is not None
+    except re.error:
+        found = pattern == text
+    found = found and failed == expect_failure
+    return found != negate
+
+def read_script(path):
+    """
+    List of (line number, line, expectation) for the lines of the
+    script at path which are not expectations. expectation is the
+    (pattern, expected fail) of the line after a numbered command,
+    or None.
+    """
+    with open(path) as f:
+        lines = f.read().splitlines()
+    script = []
+    for i, line in enumerate(lines):
+        if EXPECTATION.match(line):
+            continue
+        expectation = None
+        if NUMBERED.match(line) and i + 1 < len(lines):
+            m = EXPECTATION.match(lines[i + 1])
+            if m:
+                expectation = (m.group(1), m.group(2) == '*')
+        script.append((i + 1, line, expectation))
+    return script
+
+def check(line_nr, line, expectation, response):
+    """
+    TestResult of the numbered command line, given its response
+    as returned by parse_response
+    """
+    pattern, expected_fail = expectation
+    if response is None:
+        failed, text = True, "no response"
+        passed = False
+    else:
+        failed, text = response
+        passed = matches(pattern, failed, text)
+    return TestResult(line_nr, NUMBERED.match(line).group(1), line.strip(),
+                      pattern, ('?' if failed else '') + text,
+                      passed, expected_fail)
+
+def run_engine_script(path, engine, timeout = DEFAULT_ENGINE_TIMEOUT):
+    """
+    Write the commands of the script at path to a new engine process,
+    started with the command line engine, and check its responses.
+    Returns (path, test results, command times) like run_script, with
+    one time for the whole process.
+    """
+    script = [entry for entry in read_script(path)
+              if command_name(entry[1]) is not None]
+    text = "".join(line + "\n" for _, line, _ in script)
+    start = time.perf_counter()
+    try:
+        output = subprocess.run(shlex.split(engine), input = text,
+                                stdout = subprocess.PIPE,
+                                universal_newlines = True,
+                                timeout = timeout).stdout
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout or ""
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", "replace")
+    times = [(time.perf_counter() - start, 1, "engine")]
+    responses = engine_responses(output)
+    results = [check(line_nr, line, expectation,
+                     responses.get(NUMBERED.match(line).group(1)))
+               for line_nr, line, expectation in script
+               if expectation is not None]
+    return path, results, times
+
+def run_script(path, board_size = DEFAULT_BOARD_SIZE):
+    """
+    Run the script at path on a new GtpConnection.
+    Returns (path, test results, command times), where command times
+    lists (seconds, line number, command name) for each command.
+    """
+    output = io.StringIO()
+    con = GtpConnection(Gomoku(), SimpleGoBoard(board_size),
+                        outfile = output)
+    results = []
+    times = []
+    try:
+        for line_nr, line, expectation in read_script(path):
+            name = command_name(line)
+            if name is None:
+                continue
+            start = time.perf_counter()
+            try:
+                con.get_cmd(line)
+            except SystemExit:
+                break
+            except Exception as e:
+                con.error("Error executing command {}".format(e))
+            finally:
+                times.append((time.perf_counter() - start, line_nr, name))
+            response = parse_response(output.getvalue())
+            output.seek(0)
+            output.truncate()
+            if expectation is not None:
+                results.append(check(line_nr, line, expectation, response))
+    finally:
+        con.stop_ponder()
+        con.close_pool()
+    return path, results, times
+
+def _run_script(args):
+    path, board_size, engine, timeout = args
+    if engine is not None:
+        return run_engine_script(path, engine, timeout)
+    return run_script(path, board_size)
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank p-th percentile of a non-empty sorted list
+    """
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+def timing_summary(times):
+    """
+    Lines of a table of command times in milliseconds, per command
+    name and over all commands
+    """
+    by_name = {}
+    for seconds, _, name in times:
+        by_name.setdefault(name, []).append(seconds)
+    header = "{:<16}{:>7}{:>11}".format("command", "count", "total") + \
+             "".join("{:>9}".format("p{}".format(p)) for p in PERCENTILES) + \
+             "{:>9}".format("max")
+    lines = [header]
+    rows = sorted(by_name.items(), key = lambda item: -sum(item[1]))
+    rows.append(("all", [seconds for seconds, _, _ in times]))
+    for name, values in rows:
+        values = sorted(values)
+        line = "{:<16}{:>7}{:>11.1f}".format(name, len(values),
+                                             1000 * sum(values))
+        for p in PERCENTILES:
+            line += "{:>9.3f}".format(1000 * percentile(values, p))
+        line += "{:>9.3f}".format(1000 * values[-1])
+        lines.append(line)
+    return lines
+
+def report(path, results, times, verbose = False, show_times = False):
+    """
+    Print the results and command times of one script.
+    Returns the number of unexpected results.
+    """
+    unexpected = [r for r in results if r.unexpected()]
+    passed = sum(1 for r in results if r.passed)
+    print("{}: {} tests, {} passed, {} unexpected, {:.1f} ms".format(
+        path, len(results), passed, len(unexpected),
+        1000 * sum(seconds for seconds, _, _ in times)))
+    for result in results:
+        if verbose or result.unexpected():
+            print("  " + result.describe(path))
+    if show_times:
+        for seconds, line_nr, name in times:
+            print("  {}:{}: {} {:.3f} ms".format(path, line_nr, name,
+                                                 1000 * seconds))
+    return len(unexpected)
+
+def run():
+    parser = argparse.ArgumentParser(
+        description = "Run GTP regression scripts in-process")
+    parser.add_argument("scripts", nargs = "+", metavar = "FILE")
+    parser.add_argument("--jobs", type = int, default = 1,
+                        help = "number of scripts run in parallel processes")
+    parser.add_argument("--size", type = int, default = DEFAULT_BOARD_SIZE,
+                        help = "initial board size")
+    parser.add_argument("--verbose", action = "store_true",
+                        help = "list the passed tests as well")
+    parser.add_argument("--times", action = "store_true",
+                        help = "list the wall time of every command")
+    parser.add_argument("--engine", metavar = "COMMAND",
+                        help = "run the scripts through this engine command "
+                               "line instead of in-process")
+    parser.add_argument("--timeout", type = float,
+                        default = DEFAULT_ENGINE_TIMEOUT,
+                        help = "seconds an engine may take for a script")
+    args = parser.parse_args()
+    assert args.jobs >= 1
+    tasks = [(path, args.size, args.engine, args.timeout)
+             for path in args.scripts]
+    start = time.perf_counter()
+    if args.jobs > 1 and len(tasks) > 1:
+        # not multiprocessing.Pool: its daemon processes could not start
+        # the worker pool of the workers command
+        with ProcessPoolExecutor(min(args.jobs, len(tasks))) as executor:
+            outcomes = list(executor.map(_run_script, tasks))
+    else:
+        outcomes = [_run_script(task) for task in tasks]
+    elapsed = time.perf_counter() - start
+    unexpected = 0
+    all_times = []
+    for path, results, times in outcomes:
+        unexpected += report(path, results, times, args.verbose, args.times)
+        all_times.extend((seconds, "{}:{}".format(path, line_nr), name)
+                         for seconds, line_nr, name in times)
+    if all_times:
+        print()
+        for line in timing_summary(all_times):
+            print(line)
+        print()
+        print("slowest commands (ms):")
+        for seconds, where, name in sorted(all_times,
+                                           reverse = True)[:NUM_SLOWEST]:
+            print("  {:>10.3f} {} {}".format(1000 * seconds, where, name))
+    num_tests = sum(len(results) for _, results, _ in outcomes)
+    print()
+    print("{} scripts, {} tests, {} unexpected, {:.2f} s".format(
+        len(outcomes), num_tests, unexpected, elapsed))
+    sys.exit(1 if unexpected else 0)
+
+if __name__=='__main__':
+    run()
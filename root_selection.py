@@ -0,0 +1,112 @@
+"""
+root_selection.py
+
+Allocation of playouts to the candidate moves at the root of genmove.
+
+Instead of giving every legal move the same number of playouts,
+these bandit algorithms spend more playouts on moves which look good:
+- ucb1: repeatedly simulate the moves with the highest UCB1 value
+- successive_halving: simulate all remaining moves equally,
+  then drop the worse half, until one move is left
+
+Both take a simulate(indices, n) function, which runs n playouts for
+each of the moves with the given indices and returns [wins, playouts]
+for each of them. playouts can be less than n if a deadline passed.
+Both can start from a MoveStats with earlier results, such as
+results found in the transposition table. In ucb1 those count
+towards the playout budget.
+"""
+
+import math
+import time
+
+# Exploration constant of UCB1
+EXPLORATION = math.sqrt(2)
+
+class MoveStats(object):
+    """
+    Wins and playouts of each candidate move
+    """
+    def __init__(self, num_moves):
+        self.wins = [0.0] * num_moves
+        self.visits = [0] * num_moves
+        self.total = 0
+
+    def add(self, indices, results):
+        for i, (wins, visits) in zip(indices, results):
+            self.wins[i] += wins
+            self.visits[i] += visits
+            self.total += visits
+
+    def mean(self, i):
+        """
+        Win rate of move i, -1 if it was never simulated
+        """
+        if self.visits[i] == 0:
+            return -1
+        return self.wins[i] / self.visits[i]
+
+def _out_of_budget(stats, max_playouts, deadline, stop = None):
+    if max_playouts is not None and stats.total >= max_playouts:
+        return True
+    if stop is not None and stop.is_set():
+        return True
+    return deadline is not None and time.time() >= deadline
+
+def ucb1(simulate, num_moves, max_playouts, deadline = None,
+         batch_size = 1, exploration = EXPLORATION, stats = None,
+         stop = None):
+    """
+    UCB1 allocation. Every move without results in stats is
+    simulated once, then each step
+    simulates the batch_size moves with the highest UCB1 value once,
+    until max_playouts playouts are done, the deadline passes or the
+    threading.Event stop is set.
+    At least one of max_playouts and deadline must be given.
+    Returns the index of the most simulated move, and the MoveStats.
+    """
+    assert max_playouts is not None or deadline is not None
+    if stats is None:
+        stats = MoveStats(num_moves)
+    indices = list(range(num_moves))
+    unvisited = [i for i in indices if stats.visits[i] == 0]
+    if unvisited:
+        stats.add(unvisited, simulate(unvisited, 1))
+    batch_size = min(batch_size, num_moves)
+    while not _out_of_budget(stats, max_playouts, deadline, stop):
+        log_total = math.log(max(stats.total, 1))
+        def value(i):
+            if stats.visits[i] == 0:
+                return float("inf")
+            return stats.mean(i) + \
+                   exploration * math.sqrt(log_total / stats.visits[i])
+        n = batch_size
+        if max_playouts is not None:
+            n = min(n, max_playouts - stats.total)
+        chosen = sorted(indices, key = value, reverse = True)[:n]
+        stats.add(chosen, simulate(chosen, 1))
+    best = max(indices, key = lambda i: (stats.visits[i], stats.mean(i)))
+    return best, stats
+
+def successive_halving(simulate, num_moves, max_playouts, deadline = None,
+                       stats = None, stop = None):
+    """
+    Successive halving over ceil(log2(num_moves)) rounds, splitting
+    max_playouts evenly over the rounds. Each round simulates all
+    remaining moves equally and keeps the better half.
+    Stops early at the deadline or when the threading.Event stop is set.
+    Returns the index of the best remaining move, and the MoveStats.
+    """
+    if stats is None:
+        stats = MoveStats(num_moves)
+    remaining = list(range(num_moves))
+    num_rounds = max(1, int(math.ceil(math.log2(max(num_moves, 1)))))
+    while len(remaining) > 1:
+        n = max(1, max_playouts // (len(remaining) * num_rounds))
+        stats.add(remaining, simulate(remaining, n))
+        if _out_of_budget(stats, None, deadline, stop):
+            break
+        remaining.sort(key = stats.mean, reverse = True)
+        remaining = remaining[: (len(remaining) + 1) // 2]
+    best = max(remaining, key = stats.mean)
+    return best, stats
@@ -10,12 +10,24 @@ The board uses a 1-dimensional representation with padding
 """
 
 import numpy as np
+import random
+import board_patterns
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, \
                        PASS, is_black_white, coord_to_point, where1d, \
-                       MAXSIZE, NULLPOINT
+                       MAXSIZE, NULLPOINT, PointSet, five_windows, \
+                       neighbourhoods, CANDIDATE_RADIUS
+
+# Seed of the Zobrist random numbers, so that keys are the same
+# in every process and every run
+ZOBRIST_SEED = 496
 
 class SimpleGoBoard(object):
 
+    # Tables which only depend on the board size, such as the neighbor
+    # lists and the empty board. They are computed once per size and
+    # shared by all boards of that size. See _size_tables.
+    _tables = {}
+
     def get_color(self, point):
         return self.board[point]
 
@@ -61,13 +73,29 @@ class SimpleGoBoard(object):
         Return:
             The empty points on the board
         """
-        return where1d(self.board == EMPTY)
+        return np.array(self.empty_set.points, dtype = np.intp)
+
+    def empty_point_list(self):
+        """
+        Return:
+            A new list of the empty points on the board
+        """
+        return list(self.empty_set.points)
+
+    def random_empty_point(self, rng = None):
+        """
+        Return a random empty point, or PASS if the board is full.
+        It is drawn from the random.Random rng, or from the random
+        module by default.
+        """
+        return self.empty_set.random_point(rng)
 
     def __init__(self, size):
         """
         Creates a Go board of given size
         """
         assert 2 <= size <= MAXSIZE
+        self.candidate_radius = CANDIDATE_RADIUS
         self.reset(size)
 
     def reset(self, size):
@@ -82,25 +110,261 @@ class SimpleGoBoard(object):
         self.ko_recapture = None
         self.current_player = BLACK
         self.maxpoint = size * size + 3 * (size + 1)
-        self.board = np.full(self.maxpoint, BORDER, dtype = np.int32)
+        tables = self._size_tables(size)
+        self.neighbors = tables["neighbors"]
+        self.row_starts = tables["row_starts"]
+        self.shifts = tables["shifts"]
+        self.board = np.copy(tables["empty_board"])
+        self.empty_set = tables["empty_set"].copy()
         self.liberty_of = np.full(self.maxpoint, NULLPOINT, dtype = np.int32)
-        self._initialize_empty_points(self.board)
-        self._initialize_neighbors()
+        self.moves = []
+        self.winner = None
+        # Zobrist key of the stones on the board: the XOR of
+        # zobrist[color][point] over all stones
+        self.zobrist = tables["zobrist"]
+        self.zobrist_key = 0
+        # per color, (zobrist_key, counts) of the last count_patterns
+        self._pattern_counts = [None, None, None]
+        self.windows = tables["windows"]
+        self.point_windows = tables["point_windows"]
+        self._reset_windows()
+        self._reset_candidates()
+
+    def _size_tables(self, size):
+        """
+        Return the tables for boards of the given size,
+        computing them on first use.
+        """
+        tables = SimpleGoBoard._tables.get(size)
+        if tables is None:
+            windows, point_windows = five_windows(size)
+            self.row_starts = [row * self.NS + 1 for row in range(size + 1)]
+            self.board = np.full(self.maxpoint, BORDER, dtype = np.int32)
+            self._initialize_empty_points(self.board)
+            self._initialize_neighbors()
+            tables = {
+                "empty_board": self.board,
+                "neighbors": self.neighbors,
+                "row_starts": self.row_starts,
+                "shifts": (1, self.NS, self.NS + 1, self.NS - 1),
+                "empty_set": PointSet(self.maxpoint,
+                                      where1d(self.board == EMPTY).tolist()),
+                "windows": [tuple(window) for window in windows.tolist()],
+                "point_windows": point_windows,
+                "zobrist": self._zobrist_table(size)
+            }
+            SimpleGoBoard._tables[size] = tables
+        return tables
+
+    def _zobrist_table(self, size):
+        """
+        Random 64-bit numbers for every color and point,
+        generated with a fixed seed per board size
+        """
+        rng = random.Random(ZOBRIST_SEED * MAXSIZE + size)
+        table = [None, None, None]
+        for color in (BLACK, WHITE):
+            table[color] = [rng.getrandbits(64)
+                            for _ in range(self.maxpoint)]
+        return table
 
     def copy(self):
-        b = SimpleGoBoard(self.size)
-        assert b.NS == self.NS
-        assert b.WE == self.WE
-        b.ko_recapture = self.ko_recapture
-        b.current_player = self.current_player
-        assert b.maxpoint == self.maxpoint
+        """
+        Return a copy of the board.
+        The size tables are shared, only the position itself is cloned.
+        """
+        b = SimpleGoBoard.__new__(SimpleGoBoard)
+        b.__dict__.update(self.__dict__)
         b.board = np.copy(self.board)
+        b.liberty_of = np.copy(self.liberty_of)
+        b.moves = list(self.moves)
+        b.empty_set = self.empty_set.copy()
+        b.window_stones = [None] + [list(self.window_stones[color])
+                                    for color in (BLACK, WHITE)]
+        b.window_hist = [None] + [list(self.window_hist[color])
+                                  for color in (BLACK, WHITE)]
+        b.four_windows = [None] + [set(self.four_windows[color])
+                                   for color in (BLACK, WHITE)]
+        b.near_stones = list(self.near_stones)
+        b.candidates = self.candidates.copy()
+        b._pattern_counts = list(self._pattern_counts)
         return b
 
+    ###########################################################################
+    # Length-5 windows.
+    # For every window of five points along a line (board_util.five_windows)
+    # the board keeps the number of stones of each color in it.
+    # A window with stones of only one color is a potential five for it.
+    # window_hist[color][k] is the number of windows with k stones of
+    # color and none of the opponent, and four_windows[color] is the set
+    # of windows with four stones of color and an empty point.
+    # Each stone added or removed only touches the windows through it.
+    ###########################################################################
+    def _reset_windows(self):
+        num_windows = len(self.windows)
+        self.window_stones = [None, [0] * num_windows, [0] * num_windows]
+        self.window_hist = [None, [num_windows, 0, 0, 0, 0, 0],
+                                  [num_windows, 0, 0, 0, 0, 0]]
+        self.four_windows = [None, set(), set()]
+
+    def _add_stone_to_windows(self, point, color):
+        """
+        Update the windows for a new stone of color on point.
+        Returns whether the stone completes a five.
+        """
+        opp_color = GoBoardUtil.opponent(color)
+        mine = self.window_stones[color]
+        theirs = self.window_stones[opp_color]
+        my_hist = self.window_hist[color]
+        their_hist = self.window_hist[opp_color]
+        five = False
+        for w in self.point_windows[point]:
+            m = mine[w]
+            o = theirs[w]
+            mine[w] = m + 1
+            if o == 0:
+                my_hist[m] -= 1
+                my_hist[m + 1] += 1
+                if m == 3:
+                    self.four_windows[color].add(w)
+                elif m == 4:
+                    self.four_windows[color].discard(w)
+                    five = True
+            if m == 0:
+                # window is no longer available to the opponent
+                their_hist[o] -= 1
+                if o == 4:
+                    self.four_windows[opp_color].discard(w)
+        return five
+
+    def _remove_stone_from_windows(self, point, color):
+        """
+        Update the windows for removing the stone of color on point.
+        Exactly reverses _add_stone_to_windows.
+        """
+        opp_color = GoBoardUtil.opponent(color)
+        mine = self.window_stones[color]
+        theirs = self.window_stones[opp_color]
+        my_hist = self.window_hist[color]
+        their_hist = self.window_hist[opp_color]
+        for w in self.point_windows[point]:
+            m = mine[w] - 1
+            o = theirs[w]
+            mine[w] = m
+            if o == 0:
+                my_hist[m + 1] -= 1
+                my_hist[m] += 1
+                if m == 4:
+                    self.four_windows[color].add(w)
+                elif m == 3:
+                    self.four_windows[color].discard(w)
+            if m == 0:
+                their_hist[o] += 1
+                if o == 4:
+                    self.four_windows[opp_color].add(w)
+
+    def count_windows(self, color, stones):
+        """
+        Number of windows with the given number of stones of color
+        and no stones of the opponent
+        """
+        return self.window_hist[color][stones]
+
+    def count_fours(self, color):
+        """
+        Number of windows with four stones of color and one empty point
+        """
+        return len(self.four_windows[color])
+
+    def winning_points(self, color):
+        """
+        Sorted list of the empty points where color makes five in a row
+        """
+        points = set()
+        for w in self.four_windows[color]:
+            for point in self.windows[w]:
+                if self.board[point] == EMPTY:
+                    points.add(point)
+        return sorted(points)
+
+    ###########################################################################
+    # Candidate moves.
+    # near_stones[point] is the number of stones at most candidate_radius
+    # rows and columns away from point, and candidates is the set of
+    # empty points with near_stones > 0. Each stone added or removed
+    # only touches the points of its neighbourhood, and removing a stone
+    # exactly reverses adding it, so the order of candidates is kept.
+    ###########################################################################
+    def _reset_candidates(self):
+        self.near = neighbourhoods(self.size, self.candidate_radius)
+        self.near_stones = [0] * self.maxpoint
+        stones = where1d((self.board == BLACK) | (self.board == WHITE))
+        for point in stones:
+            for nb in self.near[point]:
+                self.near_stones[nb] += 1
+        self.candidates = PointSet(self.maxpoint,
+            [point for point in self.empty_set.points
+             if self.near_stones[point] > 0])
+
+    def _add_stone_to_candidates(self, point):
+        if self.near_stones[point] > 0:
+            self.candidates.remove(point)
+        near_stones = self.near_stones
+        for nb in self.near[point]:
+            near_stones[nb] += 1
+            if near_stones[nb] == 1 and self.board[nb] == EMPTY:
+                self.candidates.add(nb)
+
+    def _remove_stone_from_candidates(self, point):
+        """
+        Exactly reverses _add_stone_to_candidates.
+        point must be EMPTY again.
+        """
+        near_stones = self.near_stones
+        for nb in reversed(self.near[point]):
+            if near_stones[nb] == 1 and self.board[nb] == EMPTY:
+                self.candidates.remove(nb)
+            near_stones[nb] -= 1
+        if near_stones[point] > 0:
+            self.candidates.restore(point)
+
+    def _capture_stone_from_candidates(self, point):
+        """
+        Update the candidates for a stone captured in play_move.
+        Unlike _remove_stone_from_candidates, captures need not
+        happen in the reverse order of the stones played.
+        point must be EMPTY again.
+        """
+        near_stones = self.near_stones
+        candidates = self.candidates
+        for nb in self.near[point]:
+            near_stones[nb] -= 1
+            if near_stones[nb] == 0 and nb in candidates:
+                candidates.remove(nb)
+        if near_stones[point] > 0:
+            candidates.add(point)
+
+    def set_candidate_radius(self, radius):
+        """
+        Make the candidates the empty points at most radius rows and
+        columns away from a stone
+        """
+        assert radius >= 1
+        self.candidate_radius = radius
+        self._reset_candidates()
+
+    def candidate_point_list(self):
+        """
+        Return:
+            A new list of the empty points near a stone,
+            empty if there are no stones
+        """
+        return list(self.candidates.points)
+
     def row_start(self, row):
         assert row >= 1
         assert row <= self.size
-        return row * self.NS + 1
+        return self.row_starts[row]
         
     def _initialize_empty_points(self, board):
         """
@@ -241,7 +505,13 @@ class SimpleGoBoard(object):
         if self._has_liberty(opp_block):
             return None
         captures = list(where1d(opp_block))
+        opp_color = self.get_color(nb_point)
         self.board[captures] = EMPTY
+        for stone in captures:
+            self.empty_set.add(stone)
+            self._remove_stone_from_windows(stone, opp_color)
+            self._capture_stone_from_candidates(stone)
+            self.zobrist_key ^= self.zobrist[opp_color][stone]
         self.liberty_of[captures] = NULLPOINT
         single_capture = None 
         if len(captures) == 1:
@@ -281,6 +551,10 @@ class SimpleGoBoard(object):
             if not self._has_liberty(block): # undo suicide move
                 self.board[point] = EMPTY
                 return False
+        self.empty_set.remove(point)
+        self._add_stone_to_windows(point, color)
+        self._add_stone_to_candidates(point)
+        self.zobrist_key ^= self.zobrist[color][point]
         self.ko_recapture = None
         if in_enemy_eye and len(single_captures) == 1:
             self.ko_recapture = single_captures[0]
@@ -347,8 +621,42 @@ class SimpleGoBoard(object):
         if self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self.empty_set.remove(point)
+        self.moves.append((point, color, self.winner))
+        self.zobrist_key ^= self.zobrist[color][point]
+        five = self._add_stone_to_windows(point, color)
+        self._add_stone_to_candidates(point)
+        if self.winner is None and five:
+            self.winner = color
         self.current_player = GoBoardUtil.opponent(color)
         return True
+
+    def move_number(self):
+        """
+        Number of gomoku moves played since the last reset
+        """
+        return len(self.moves)
+
+    def undo_move(self):
+        """
+        Take back the last move played with play_move_gomoku.
+        The player who made that move is to play again.
+        """
+        point, color, self.winner = self.moves.pop()
+        self.board[point] = EMPTY
+        self.empty_set.restore(point)
+        self._remove_stone_from_windows(point, color)
+        self._remove_stone_from_candidates(point)
+        self.zobrist_key ^= self.zobrist[color][point]
+        self.current_player = color
+
+    def reset_to_move_number(self, move_nr):
+        """
+        Undo moves until only the first move_nr moves remain
+        """
+        assert 0 <= move_nr <= self.move_number()
+        while len(self.moves) > move_nr:
+            self.undo_move()
         
     def _point_direction_check_connect_gomoko(self, point, shift):
         """
@@ -364,7 +672,7 @@ class SimpleGoBoard(object):
             if self.board[p] == color:
                 count = count + 1
                 if count == 5:
-                    break
+                    return True
             else:
                 break
         d = -d
@@ -483,37 +791,35 @@ class SimpleGoBoard(object):
     ###########################################################################
     def check_block_win_gomoku(self, color):
         """
-            Check if the game ends for the game of Gomoku.
+            Count the opponent stones for which point_check_block_win_gomoku
+            holds, i.e. OO.OO and similar situations color must block.
+            All stones are checked at once by board_patterns.
             """
         color = self.opposite_color(color)
-        points = where1d(self.board == color)
-
-        num_block_situations = 0
-
-        #color has OO.OO
-        for point in points:
-            if self.point_check_block_win_gomoku(point):
-                num_block_situations += 1
-
-        return num_block_situations
+        return self.count_patterns(color)[0]
     ###########################################################################
+
+    def count_patterns(self, color):
+        """
+            The block win, open four and block open four counts of the
+            stones of color, from one board_patterns scan.
+            The result is kept until the position changes, so callers
+            which need several of the counts pay for one scan.
+            """
+        cached = self._pattern_counts[color]
+        if cached is not None and cached[0] == self.zobrist_key:
+            return cached[1]
+        counts = tuple(board_patterns.count_patterns(self, color))
+        self._pattern_counts[color] = (self.zobrist_key, counts)
+        return counts
     
     def check_game_end_gomoku(self):
         """
             Check if the game ends for the game of Gomoku.
+            The winner is the first player who made five in a row with
+            play_move_gomoku. It is updated on every move, so this is O(1).
             """
-        white_points = where1d(self.board == WHITE)
-        black_points = where1d(self.board == BLACK)
-        
-        for point in white_points:
-            if self.point_check_game_end_gomoku(point):
-                return True, WHITE
-    
-        for point in black_points:
-            if self.point_check_game_end_gomoku(point):
-                return True, BLACK
-
-        return False, None
+        return self.winner is not None, self.winner
 
     def opposite_color(self, color):
         newcolor = None
@@ -530,18 +836,10 @@ class SimpleGoBoard(object):
     ###########################################################################
     def check_open_four_gomoku(self, color):
         """
-            Check if the game ends for the game of Gomoku.
+            Count the stones of color for which point_check_open_four_gomoku
+            holds. All stones are checked at once by board_patterns.
             """
-        points = where1d(self.board == color)
-
-        num_open_situations = 0
-
-        #color has O.OO
-        for point in points:
-            if self.point_check_open_four_gomoku(point):
-                num_open_situations += 1
-
-        return num_open_situations
+        return self.count_patterns(color)[1]
     ###########################################################################
 
     ###########################################################################
@@ -624,19 +922,12 @@ class SimpleGoBoard(object):
     ###########################################################################
     def check_block_open_four_gomoku(self, color):
         """
-            Check if the game ends for the game of Gomoku.
+            Count the opponent stones for which
+            point_check_block_open_four_gomoku holds.
+            All stones are checked at once by board_patterns.
             """
         color = self.opposite_color(color)
-        points = where1d(self.board == color)
-
-        num_block_open_situations = 0
-
-        #color has O.OO
-        for point in points:
-            if self.point_check_block_open_four_gomoku(point):
-                num_block_open_situations += 1
-
-        return num_block_open_situations
+        return self.count_patterns(color)[2]
     ###########################################################################
 
     ###########################################################################
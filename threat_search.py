@@ -0,0 +1,171 @@
+"""
+threat_search.py
+
+Threat-space search for forced Gomoku wins.
+
+VCF (victory by continuous fours): the attacker only plays moves which
+make a four, so the defender has exactly one reply, until the attacker
+has two winning points or a five.
+
+VCT (victory by continuous threats): the attacker may also play a
+threat, a move after which the attacker would win by VCF if the
+defender passed. The defender then tries every reply in the zone of
+that VCF (the points it uses) and every move which makes a four of
+its own. Moves outside the zone leave the VCF in place.
+
+Fours are found with the length-5 window tables of SimpleGoBoard:
+a window with three stones of the attacker and none of the defender
+becomes a four when the attacker plays one of its empty points,
+and winning_points lists the points which complete a five.
+"""
+
+import time
+from board_util import GoBoardUtil, EMPTY
+
+# Default limits of a single solve
+MAX_NODES = 20000
+TIME_LIMIT = 1.0
+# Number of threats the attacker may play in VCT
+VCT_DEPTH = 3
+
+class SearchLimit(Exception):
+    """
+    Raised when the node or time limit of the search is reached
+    """
+
+def window_moves(board, color, stones):
+    """
+    Sorted empty points of the windows with the given number of
+    stones of color and none of the opponent
+    """
+    opp_color = GoBoardUtil.opponent(color)
+    mine = board.window_stones[color]
+    theirs = board.window_stones[opp_color]
+    points = set()
+    for w, count in enumerate(mine):
+        if count == stones and theirs[w] == 0:
+            for point in board.windows[w]:
+                if board.board[point] == EMPTY:
+                    points.add(point)
+    return sorted(points)
+
+def four_moves(board, color):
+    """
+    Empty points where color makes a four
+    """
+    return window_moves(board, color, 3)
+
+class ThreatSolver(object):
+    """
+    VCF and VCT solver with a node and a time limit
+    """
+    def __init__(self, max_nodes = MAX_NODES, time_limit = TIME_LIMIT,
+                 vct_depth = VCT_DEPTH):
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.vct_depth = vct_depth
+        self.nodes = 0
+
+    def solve(self, board, color, vct = False, deadline = None,
+              stop = None):
+        """
+        Look for a forced win of color, to move on board.
+        Stops at the node limit, the time limit, the deadline or when
+        the threading.Event stop is set.
+        board is unchanged on return.
+        Returns the first move of a proven win, or None.
+        """
+        self.nodes = 0
+        self.stop = stop
+        self.deadline = time.time() + self.time_limit
+        if deadline is not None:
+            self.deadline = min(self.deadline, deadline)
+        move_nr = board.move_number()
+        try:
+            if vct:
+                return self._vct(board, color, self.vct_depth)
+            return self._vcf(board, color)
+        except SearchLimit:
+            board.reset_to_move_number(move_nr)
+            return None
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes or time.time() >= self.deadline:
+            raise SearchLimit()
+        if self.stop is not None and self.stop.is_set():
+            raise SearchLimit()
+
+    def _vcf(self, board, attacker, zone = None):
+        """
+        First move of a VCF of attacker, to move on board, or None.
+        If zone is a set, the points used by the VCF are added to it.
+        """
+        self._count_node()
+        fives = board.winning_points(attacker)
+        if fives:
+            if zone is not None:
+                zone.add(fives[0])
+            return fives[0]
+        defender = GoBoardUtil.opponent(attacker)
+        defender_fives = board.winning_points(defender)
+        if len(defender_fives) > 1:
+            return None
+        candidates = four_moves(board, attacker)
+        if defender_fives:
+            # the attacker has to block, which only keeps the
+            # initiative if the block is a four as well
+            candidates = [p for p in candidates if p == defender_fives[0]]
+        for move in candidates:
+            board.play_move_gomoku(move, attacker)
+            fives = board.winning_points(attacker)
+            won = False
+            if len(fives) >= 2:
+                won = True
+                if zone is not None:
+                    zone.update(fives)
+            else:
+                reply = fives[0]
+                board.play_move_gomoku(reply, defender)
+                won = self._vcf(board, attacker, zone) is not None
+                board.undo_move()
+                if won and zone is not None:
+                    zone.add(reply)
+            board.undo_move()
+            if won:
+                if zone is not None:
+                    zone.add(move)
+                return move
+        return None
+
+    def _vct(self, board, attacker, depth):
+        """
+        First move of a VCT of attacker, to move on board, with at most
+        depth threats which are not fours, or None
+        """
+        move = self._vcf(board, attacker)
+        if move is not None or depth == 0:
+            return move
+        defender = GoBoardUtil.opponent(attacker)
+        if board.winning_points(defender):
+            return None
+        for move in window_moves(board, attacker, 2):
+            board.play_move_gomoku(move, attacker)
+            zone = set()
+            won = False
+            if self._vcf(board, attacker, zone) is not None:
+                replies = zone.union(four_moves(board, defender))
+                won = True
+                for reply in sorted(replies):
+                    if board.board[reply] != EMPTY:
+                        continue
+                    board.play_move_gomoku(reply, defender)
+                    refuted = self._vct(board, attacker, depth - 1) is None
+                    board.undo_move()
+                    if refuted:
+                        won = False
+                        break
+            board.undo_move()
+            if won:
+                return move
+        return None
@@ -0,0 +1,111 @@
+"""
+time_control.py
+
+Keeps track of the game clock given by the GTP commands time_settings
+and time_left, and turns it into a time budget for a single genmove.
+"""
+
+from board_util import BLACK, WHITE
+
+class TimeControl(object):
+    """
+    Time budget per move.
+
+    Without any settings there is no budget, and genmove runs its
+    fixed number of simulations. A fixed number of seconds per move
+    overrides the clock.
+    """
+    # Part of the computed budget which is actually used,
+    # to leave time for the move selection and the GTP round trip
+    SAFETY = 0.8
+    # Seconds kept back from every budget for the same reason
+    OVERHEAD = 0.05
+    # Smallest budget ever returned
+    MIN_BUDGET = 0.01
+    # Never plan for fewer remaining own moves than this
+    MIN_MOVES_LEFT = 5
+
+    def __init__(self):
+        self.fixed_seconds = None
+        self.main_time = None
+        self.byo_yomi_time = 0
+        self.byo_yomi_stones = 0
+        self.new_game()
+
+    def new_game(self):
+        """
+        Restore the full main time for both players
+        """
+        self.time_left = {BLACK: self.main_time, WHITE: self.main_time}
+        self.stones_left = {BLACK: 0, WHITE: 0}
+
+    def set_fixed(self, seconds):
+        """
+        Use seconds per move, or the clock again if seconds is None
+        """
+        self.fixed_seconds = seconds
+
+    def set_time_settings(self, main_time, byo_yomi_time, byo_yomi_stones):
+        """
+        GTP time_settings. byo_yomi_time > 0 with byo_yomi_stones == 0
+        means no time limit.
+        """
+        if byo_yomi_time > 0 and byo_yomi_stones == 0:
+            self.main_time = None
+        else:
+            self.main_time = main_time
+        self.byo_yomi_time = byo_yomi_time
+        self.byo_yomi_stones = byo_yomi_stones
+        self.new_game()
+
+    def set_time_left(self, color, time_left, stones_left):
+        """
+        GTP time_left. stones_left == 0 means time_left is main time,
+        otherwise it is the byo-yomi time left for that many stones.
+        """
+        self.time_left[color] = time_left
+        self.stones_left[color] = stones_left
+
+    def used(self, color, seconds):
+        """
+        Subtract the time used by a genmove from the clock of color,
+        until the controller sends the next time_left
+        """
+        if self.time_left[color] is None:
+            return
+        self.time_left[color] -= seconds
+        if self.time_left[color] <= 0 and self.stones_left[color] == 0 \
+           and self.byo_yomi_stones > 0:
+            # main time is over, byo-yomi starts
+            self.time_left[color] = self.byo_yomi_time
+            self.stones_left[color] = self.byo_yomi_stones
+        elif self.stones_left[color] > 0:
+            self.stones_left[color] -= 1
+            if self.stones_left[color] == 0:
+                # new byo-yomi period
+                self.time_left[color] = self.byo_yomi_time
+                self.stones_left[color] = self.byo_yomi_stones
+
+    def budget(self, color, num_empty):
+        """
+        Seconds to spend on the next move of color,
+        or None if there is no time limit.
+        num_empty is the number of empty points on the board.
+        """
+        if self.fixed_seconds is not None:
+            return self._with_margin(self.fixed_seconds)
+        time_left = self.time_left[color]
+        if time_left is None:
+            return None
+        stones_left = self.stones_left[color]
+        if stones_left > 0:
+            budget = time_left / stones_left
+        else:
+            moves_left = max(num_empty // 2, self.MIN_MOVES_LEFT)
+            budget = time_left / moves_left
+            if self.byo_yomi_stones > 0:
+                budget += self.byo_yomi_time / self.byo_yomi_stones
+        return self._with_margin(budget)
+
+    def _with_margin(self, budget):
+        return max(budget * self.SAFETY - self.OVERHEAD, self.MIN_BUDGET)
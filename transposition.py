@@ -0,0 +1,163 @@
+"""
+transposition.py
+
+A transposition table: a hash table of search results with a fixed
+number of entries, keyed by the Zobrist key of a position
+(SimpleGoBoard.zobrist_key) combined with the player to move.
+
+Each entry stores a value, a number of visits, a best move and a depth.
+The entries are kept in NumPy arrays, so the memory used is fixed by
+the size given in MB. The table is split into buckets of two slots:
+- the first slot keeps the entry with the largest depth
+- the second slot always takes a new entry that loses against the first
+A stored key found in either slot is simply overwritten.
+"""
+
+import random
+import numpy as np
+from board_util import BLACK, WHITE
+
+DEFAULT_MB = 16
+# Slots per bucket: depth-preferred and always-replace
+BUCKET_SIZE = 2
+# Bytes per entry: key, value, visits, move and depth
+ENTRY_BYTES = 8 + 8 + 8 + 4 + 4
+# depth of an empty slot
+EMPTY_DEPTH = -1
+
+def key_salt(name):
+    """
+    Fixed 64-bit number for name, to keep results of different
+    kinds of search apart in one table
+    """
+    return random.Random(name).getrandbits(64)
+
+TO_PLAY_KEYS = {BLACK: key_salt("black to play"),
+                WHITE: key_salt("white to play")}
+
+def position_key(board, color, salt = 0):
+    """
+    Key of the board position with color to play
+    """
+    return board.zobrist_key ^ TO_PLAY_KEYS[color] ^ salt
+
+def child_key(board, color, move, salt = 0):
+    """
+    Key of the position after color plays move on board,
+    with the opponent to play, without playing the move
+    """
+    opp_color = WHITE if color == BLACK else BLACK
+    return board.zobrist_key ^ board.zobrist[color][move] ^ \
+           TO_PLAY_KEYS[opp_color] ^ salt
+
+def visits_depth(visits):
+    """
+    Depth of a Monte Carlo result: it grows with the log of the number
+    of playouts, so results with more playouts are preferred
+    """
+    return int(visits).bit_length()
+
+class TranspositionTable(object):
+    """
+    Fixed size table of (value, visits, move, depth) entries
+    """
+    def __init__(self, megabytes = DEFAULT_MB):
+        assert megabytes > 0
+        self.megabytes = megabytes
+        num_entries = int(megabytes * 2 ** 20) // ENTRY_BYTES
+        self.num_buckets = max(1, num_entries // BUCKET_SIZE)
+        self.capacity = self.num_buckets * BUCKET_SIZE
+        self.keys = np.zeros(self.capacity, dtype = np.uint64)
+        self.values = np.zeros(self.capacity, dtype = np.float64)
+        self.visits = np.zeros(self.capacity, dtype = np.int64)
+        self.moves = np.zeros(self.capacity, dtype = np.int32)
+        self.depths = np.full(self.capacity, EMPTY_DEPTH, dtype = np.int32)
+        self.used = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def clear(self):
+        self.depths.fill(EMPTY_DEPTH)
+        self.used = 0
+        self.reset_stats()
+
+    def _find(self, key):
+        """
+        Slot of key, or -1, and the first slot of its bucket
+        """
+        first = (key % self.num_buckets) * BUCKET_SIZE
+        k = np.uint64(key)
+        for slot in range(first, first + BUCKET_SIZE):
+            if self.depths[slot] != EMPTY_DEPTH and self.keys[slot] == k:
+                return slot, first
+        return -1, first
+
+    def probe(self, key):
+        """
+        Return (value, visits, move, depth) stored for key, or None
+        """
+        self.probes += 1
+        slot, _ = self._find(key)
+        if slot < 0:
+            return None
+        self.hits += 1
+        return (float(self.values[slot]), int(self.visits[slot]),
+                int(self.moves[slot]), int(self.depths[slot]))
+
+    def store(self, key, value, visits, move, depth):
+        """
+        Store an entry for key, replacing the entry for the same key
+        if there is one. depth must be >= 0.
+        """
+        assert depth >= 0
+        self.stores += 1
+        slot, first = self._find(key)
+        if slot < 0:
+            preferred = first
+            always = first + 1
+            if self.depths[preferred] <= depth:
+                # the new entry takes the depth-preferred slot and
+                # the entry there moves to the always-replace slot
+                if self.depths[preferred] != EMPTY_DEPTH:
+                    self._move(preferred, always)
+                slot = preferred
+            else:
+                slot = always
+            if self.depths[slot] == EMPTY_DEPTH:
+                self.used += 1
+            else:
+                self.replacements += 1
+        self.keys[slot] = np.uint64(key)
+        self.values[slot] = value
+        self.visits[slot] = visits
+        self.moves[slot] = move
+        self.depths[slot] = depth
+
+    def _move(self, source, target):
+        if self.depths[target] == EMPTY_DEPTH:
+            self.used += 1
+        else:
+            self.replacements += 1
+        self.keys[target] = self.keys[source]
+        self.values[target] = self.values[source]
+        self.visits[target] = self.visits[source]
+        self.moves[target] = self.moves[source]
+        self.depths[target] = self.depths[source]
+        self.depths[source] = EMPTY_DEPTH
+        self.used -= 1
+
+    def hit_rate(self):
+        if self.probes == 0:
+            return 0.0
+        return self.hits / self.probes
+
+    def occupancy(self):
+        return self.used / self.capacity
+
+    def memory_bytes(self):
+        return self.capacity * ENTRY_BYTES